@@ -1,33 +1,17 @@
 r"""Very experimental miscellaneous and extra utilities for fortios.
 """
 from __future__ import absolute_import
-from .api import (  # noqa: F401
-    parse_and_save_show_configs,
-    query_json_files,
-    collect_networks,
-    collect_and_save_networks,
-    compose_networks,
-    compose_and_save_networks,
-    make_firewall_policy_table,
-    make_firewall_policy_tables,
-    make_and_save_firewall_policy_table,
-    make_and_save_firewall_policy_tables,
-    load_firewall_policy_table,
-    search_firewall_policy_table_by_addr,
-    load_network_graph,
-    find_network_nodes_by_ip,
-    find_network_paths,
-    NODE_TYPES,
-    NODE_ANY, NODE_NET, NODE_HOST, NODE_ROUTER, NODE_SWITCH, NODE_FIREWALL
-)
 
 
 __version__ = "0.4.2"
 
 __all__ = """
 parse_and_save_show_configs
+query_json_file
+query_json_files_itr
 query_json_files
 collect_networks
+collect_and_save_networks_itr
 collect_and_save_networks
 compose_networks
 compose_and_save_networks
@@ -37,6 +21,7 @@ make_and_save_firewall_policy_table
 make_and_save_firewall_policy_tables
 load_firewall_policy_table
 search_firewall_policy_table_by_addr
+search_firewall_policy_table_by_addrs
 load_network_graph
 find_network_nodes_by_ip
 find_network_paths
@@ -49,4 +34,25 @@ NODE_SWITCH
 NODE_FIREWALL
 """.split()
 
+
+def __getattr__(name):
+    """
+    Import the APIs lazily on first access to avoid importing heavy modules
+    such as pandas and networkx until they are needed.
+    """
+    if name not in __all__:
+        raise AttributeError("module {!r} has no attribute "
+                             "{!r}".format(__name__, name))
+
+    from . import api  # pylint: disable=import-outside-toplevel
+
+    value = globals()[name] = getattr(api, name)
+    return value
+
+
+def __dir__():
+    """List the APIs loaded lazily as well.
+    """
+    return sorted(set(globals()) | set(__all__))
+
 # vim:sw=4:ts=4:et:
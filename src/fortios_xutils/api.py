@@ -6,7 +6,15 @@ r"""Find network nodes.
 """
 from __future__ import absolute_import
 
-from . import finder, firewall, network, parser, utils
+import functools
+import itertools
+
+from . import network, parser, utils
+
+# .. note::
+#    firewall and finder modules import pandas and networkx which take long
+#    time to import, so that they are imported in the functions need them.
+# pylint: disable=import-outside-toplevel
 
 # pylint: disable=unused-import
 from .network import (  # noqa: F401
@@ -15,7 +23,17 @@ from .network import (  # noqa: F401
 )
 
 
-def parse_and_save_show_configs(filepaths, outdir):
+def _parse_show_config_and_dump_path(inpath, **opts):
+    """
+    Similar to :func:`fortios_xutils.parser.parse_show_config_and_dump` but
+    return the output path only not to send the parsed result back from
+    worker processes.
+    """
+    return parser.parse_show_config_and_dump(inpath, **opts)[0]
+
+
+def parse_and_save_show_configs(filepaths, outdir, max_workers=None,
+                                cache_dir=None, paths_only=False):
     """
     :param filepaths:
         An iterable object yields a str or :class:`pathlib.Path` object gives a
@@ -28,17 +46,66 @@ def parse_and_save_show_configs(filepaths, outdir):
         Dir to save parsed results as JSON files. "out/" relative to paths in
         given `filepaths` by default.
 
+    :param max_workers:
+        Max number of processes to parse files in parallel; the number of CPUs
+        by default, and files are parsed serially if it's 1.
+
+    :param cache_dir:
+        Dir to cache parsed results. Files were not changed since the last run
+        will not be parsed again if it's given.
+
+    :param paths_only:
+        Return the output file paths only if True. The parsed results are
+        copied back in full from the worker processes and kept in a list
+        otherwise, which may take a lot of memory for many large files.
+
     :return:
         A list of pairs of ((all) output filepath, a mapping object contains
-        parsed result)
+        parsed result), or a list of the output file paths if `paths_only`
 
     :raises: IOError, OSError
     """
-    fsit = utils.expand_glob_paths_itr(filepaths)
-    return list(parser.parse_show_configs_and_dump_itr(fsit, outdir))
+    fsit = utils.resolve_filepaths(filepaths)
+    fnc = functools.partial(
+        _parse_show_config_and_dump_path if paths_only
+        else parser.parse_show_config_and_dump,
+        outdir=outdir, cache_dir=cache_dir
+    )
+
+    return utils.pmap(fnc, fsit, max_workers=max_workers, chunksize=4)
+
+
+def _query_json_file(filepath, path_exp, has_vdoms_=None):
+    """
+    :param filepath: A str gives a path to the JSON file to query
+    :param path_exp: JMESPath expression to query
+    :param has_vdoms_:
+        True if vdoms are configured in the file, or None to check it
+
+    :return: A tuple of (the query result, has_vdoms_)
+    """
+    cnf = parser.load_for_query(filepath, path_exp)
+    if has_vdoms_ is None:
+        has_vdoms_ = parser.has_vdom(cnf)
+
+    return (parser.jmespath_search(path_exp, cnf, has_vdoms_=has_vdoms_),
+            has_vdoms_)
+
+
+def query_json_file(filepath, path_exp):
+    """
+    :param filepath:
+        A str or :class:`pathlib.Path` object gives a path to the JSON file to
+        query using JMESPath expression `path_exp`
+    :param path_exp: JMESPath expression to query
+
+    :return: A mapping object gives the query result
+    """
+    return _query_json_file(filepath, path_exp)[0]
 
 
-def _query_json_files_itr(filepaths, path_exp):
+def query_json_files_itr(filepaths, path_exp, strict_vdom=True,
+                         max_workers=None):
     """
     :param filepaths:
         An iterable object yields a str or :class:`pathlib.Path` object gives a
@@ -47,18 +114,46 @@ def _query_json_files_itr(filepaths, path_exp):
         format to query using JMESPath expression `path_exp`.
 
     :param path_exp: JMESPath expression to query
+    :param strict_vdom:
+        Check if vdoms are configured in each file if True (default), or check
+        it only in the first file and assume the rest are same if False; the
+        later is faster but only safe if all files came from the same kind of
+        devices
+    :param max_workers:
+        Max number of threads to load and query files in parallel to overlap
+        I/O; see :class:`concurrent.futures.ThreadPoolExecutor` for the
+        default, and files are processed serially if it's 1.
 
     :yields:
         A tuple of (input file path, a mapping object gives the query result)
+        in the same order as `filepaths`
+    :raises: jmespath.exceptions.ParseError if `path_exp` is not valid
     """
-    for filepath in utils.expand_glob_paths_itr(filepaths):
-        cnf = parser.load(filepath)
-        res = parser.jmespath_search(path_exp, cnf,
-                                     has_vdoms_=parser.has_vdom(cnf))
+    # Compile it once here and fail first if it's not a valid expression.
+    utils.compile_jmespath(path_exp)
+
+    fpaths = utils.expand_glob_paths_itr(filepaths)
+    has_vdoms_ = None
+
+    if not strict_vdom:
+        fpath = next(fpaths, None)
+        if fpath is None:
+            return
+
+        (res, has_vdoms_) = _query_json_file(fpath, path_exp)
+        yield (fpath, res)
+
+    fnc = functools.partial(_query_json_file, path_exp=path_exp,
+                            has_vdoms_=has_vdoms_)
+    (fpaths, fpaths_2) = itertools.tee(fpaths)
+    for filepath, (res, _has_vdoms) in zip(
+            fpaths, utils.tmap_itr(fnc, fpaths_2, max_workers=max_workers)
+    ):
         yield (filepath, res)
 
 
-def query_json_files(filepaths, path_exp):
+def query_json_files(filepaths, path_exp, strict_vdom=True,
+                     max_workers=None):
     """
     :param filepaths:
         An iterable object yields a str or :class:`pathlib.Path` object gives a
@@ -67,13 +162,17 @@ def query_json_files(filepaths, path_exp):
         format to query using JMESPath expression `path_exp`.
 
     :param path_exp: JMESPath expression to query
+    :param strict_vdom: See :func:`query_json_files_itr`
+    :param max_workers: See :func:`query_json_files_itr`
 
     :return:
-        A list of tuples of (input file path, a mapping object gives the query
-        result)
+        A list of mapping objects of {filepath: input file path, results: the
+        query result}
     """
-    return [dict(filepath=t[0], results=t[1]) for t
-            in _query_json_files_itr(filepaths, path_exp)]
+    return [dict(filepath=fpath, results=res) for fpath, res
+            in query_json_files_itr(filepaths, path_exp,
+                                    strict_vdom=strict_vdom,
+                                    max_workers=max_workers)]
 
 
 def collect_networks(filepaths, prefix=network.NET_MAX_PREFIX):
@@ -91,12 +190,35 @@ def collect_networks(filepaths, prefix=network.NET_MAX_PREFIX):
 
     :return: A tuple of (input file path, a mapping object gives the result)
     """
-    fsit = utils.expand_glob_paths_itr(filepaths)
+    fsit = utils.resolve_filepaths(filepaths)
     return network.collect_networks_from_config_files(fsit, prefix=prefix)
 
 
+def collect_and_save_networks_itr(filepaths, outdir=False,
+                                  prefix=network.NET_MAX_PREFIX,
+                                  max_workers=None):
+    """
+    Similar to :func:`collect_and_save_networks` but process files as glob
+    patterns in `filepaths` are expanded, and yield the results in order as
+    they are ready instead of keeping all of them.
+
+    :param filepaths: See :func:`collect_and_save_networks`
+    :param outdir: Dir to save outputs [same dir input files exist]
+    :param prefix: See :func:`collect_and_save_networks`
+    :param max_workers: See :func:`collect_and_save_networks`
+
+    :yield: A mapping object gives the result
+    """
+    fsit = utils.expand_glob_paths_itr(filepaths)
+    opts = dict(outdir=outdir, prefix=prefix, max_workers=max_workers)
+
+    return network.collect_and_save_networks_from_config_files_itr(fsit,
+                                                                   **opts)
+
+
 def collect_and_save_networks(filepaths, outdir=False,
-                              prefix=network.NET_MAX_PREFIX):
+                              prefix=network.NET_MAX_PREFIX,
+                              max_workers=None):
     """
     :param filepaths:
         An iterable object yields a str or :class:`pathlib.Path` object gives a
@@ -109,11 +231,14 @@ def collect_and_save_networks(filepaths, outdir=False,
     :param prefix:
         Max network prefix to collect; networks with prefix larger than this
         value will be summarized to networks with smaller prefix.
+    :param max_workers:
+        Max number of processes to collect networks in parallel; the number of
+        CPUs by default, and files are processed serially if it's 1.
 
     :return: A tuple of (input file path, a mapping object gives the result)
     """
-    fsit = utils.expand_glob_paths_itr(filepaths)
-    opts = dict(outdir=outdir, prefix=prefix)
+    fsit = utils.resolve_filepaths(filepaths)
+    opts = dict(outdir=outdir, prefix=prefix, max_workers=max_workers)
 
     return network.collect_and_save_networks_from_config_files(fsit, **opts)
 
@@ -129,7 +254,7 @@ def compose_networks(filepaths):
 
     :return: A graph data contains metadata, nodes and links data
     """
-    fsit = utils.expand_glob_paths_itr(filepaths)
+    fsit = utils.resolve_filepaths(filepaths)
     return network.compose_network_files(fsit)
 
 
@@ -146,7 +271,7 @@ def compose_and_save_networks(filepaths, outpath=False):
 
     :return: A graph data contains metadata, nodes and links data
     """
-    fsit = utils.expand_glob_paths_itr(filepaths)
+    fsit = utils.resolve_filepaths(filepaths)
     return network.compose_and_save_network_files(fsit, outpath=outpath)
 
 
@@ -163,10 +288,12 @@ def make_firewall_policy_table(filepath):
         A :class:`pandas.DataFrame` object contains the firewall policy table
         data
     """
+    from . import firewall
+
     return firewall.make_firewall_policy_table(filepath)
 
 
-def make_firewall_policy_tables(filepaths):
+def make_firewall_policy_tables(filepaths, max_workers=None):
     """
     :param filepaths:
         An iterable object yields a str or :class:`pathlib.Path` object gives a
@@ -175,11 +302,18 @@ def make_firewall_policy_tables(filepaths):
         format and contain parsed result of fortigate's "show
         full-configuration" or any other 'show ...' outputs.
 
+    :param max_workers:
+        Max number of processes to make tables in parallel; the number of CPUs
+        by default, and tables are made serially if it's 1.
+
     :return:
         A list of :class:`pandas.DataFrame` objects contain the firewall policy
-        table data
+        table data, which are copied back in full from the worker processes
     """
-    return firewall.make_firewall_policy_tables(filepaths)
+    from . import firewall
+
+    fsit = utils.resolve_filepaths(filepaths)
+    return firewall.make_firewall_policy_tables(fsit, max_workers=max_workers)
 
 
 def make_and_save_firewall_policy_table(filepath, outpath, vdom=None):
@@ -196,13 +330,16 @@ def make_and_save_firewall_policy_table(filepath, outpath, vdom=None):
         A :class:`pandas.DataFrame` objects contain the firewall policy
         table data made from given `filepath`
     """
+    from . import firewall
+
     return firewall.make_and_save_firewall_policy_table(
         filepath, outpath, vdom=vdom
     )
 
 
 def make_and_save_firewall_policy_tables(filepaths, outname=None,
-                                         outdir=False):
+                                         outdir=False, max_workers=None,
+                                         compression=None, paths_only=False):
     """
     :param filepaths:
         An iterable object yields a str or :class:`pathlib.Path` object gives a
@@ -216,13 +353,26 @@ def make_and_save_firewall_policy_tables(filepaths, outname=None,
         given)
 
     :param outdir: Output dir to save results
+    :param max_workers:
+        Max number of processes to make tables in parallel; the number of CPUs
+        by default, and tables are made serially if it's 1.
+    :param compression:
+        Compression method to save outputs, one of utils.COMPRESSION_METHODS,
+        e.g. 'gzip', or None (not compressed)
+    :param paths_only:
+        Return the output file paths only if True. The tables are copied back
+        in full from the worker processes and kept in a list otherwise.
 
     :return:
         A list of :class:`pandas.DataFrame` objects contain the firewall policy
-        table data
+        table data, or the output file paths if `paths_only`
     """
+    from . import firewall
+
+    fsit = utils.resolve_filepaths(filepaths)
     return firewall.make_and_save_firewall_policy_tables(
-        filepaths, outname=outname, outdir=outdir
+        fsit, outname=outname, outdir=outdir, max_workers=max_workers,
+        compression=compression, paths_only=paths_only
     )
 
 
@@ -233,9 +383,12 @@ def load_firewall_policy_table(filepath):
         firewall policy table data
 
     :return:
-        A :class:`pandas.DataFrame` object gives firewall policy table data
+        A :class:`pandas.DataFrame` object gives firewall policy table data,
+        which is a copy of the cached one and the caller may modify it
     """
-    return firewall.load_firewall_policy_table(filepath)
+    from . import firewall
+
+    return firewall.load_firewall_policy_table(filepath).copy()
 
 
 def search_firewall_policy_table_by_addr(ip_s, tbl_df):
@@ -247,18 +400,39 @@ def search_firewall_policy_table_by_addr(ip_s, tbl_df):
 
     :return: A list of mappping objects contains results
     """
+    from . import firewall
+
     return firewall.search_by_addr_1(ip_s, tbl_df)
 
 
+def search_firewall_policy_table_by_addrs(ip_ss, tbl_df):
+    """
+    :param ip_ss: A list of str represent IP addresses
+    :param tbl_df:
+        A :class:`pandas.DataFrame` object gives firewall policy table data
+
+    :return:
+        A dict of {ip_s: [<mapping object contains results>]} for each of
+        `ip_ss`
+    """
+    from . import firewall
+
+    return firewall.search_by_addrs(ip_ss, tbl_df)
+
+
 def load_network_graph(filepath):
     """
     :param filepath:
         A str or :class:`pathlib.Path` object gives a path of network graph
         data ({'nodes': ..., 'links': ...}) in JSON or YAML formats
 
-    :return: A :class:`networkx.Graph` object contains the network data
+    :return:
+        A :class:`networkx.Graph` object contains the network data, which is a
+        copy of the cached one and the caller may modify it
     """
-    return finder.load(filepath)
+    from . import finder
+
+    return finder.load(filepath).copy()
 
 
 def find_network_nodes_by_ip(filepath, ipa):
@@ -273,6 +447,8 @@ def find_network_nodes_by_ip(filepath, ipa):
 
     .. note:: 10.0.0.0/8 < 10.1.1.0/24 in ipaddress
     """
+    from . import finder
+
     return finder.find_net_nodes_by_ip(filepath, ipa)
 
 
@@ -289,10 +465,14 @@ def find_network_paths(filepath, src, dst, node_type=False, **nx_opts):
         Keyword options given to networkx.all_shortest_paths() such as method,
         and weight
 
-    :return: An iterable object to yield nodes in the found paths
+    :return:
+        An iterable object to yield nodes in the found paths, in the order
+        from `src` to `dst`; see :func:`fortios_xutils.finder.find_paths_itr`
     :raises:
         ValueError if given src and/or dst is not an IP address string, etc.
     """
+    from . import finder
+
     return finder.find_paths(filepath, src, dst, node_type=node_type,
                              **nx_opts)
 
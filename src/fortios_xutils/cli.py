@@ -10,25 +10,104 @@ r"""Misc CLI commands.
 """
 from __future__ import absolute_import
 
+import collections
+import itertools
 import logging
 
-import anyconfig
 import click
 
 import fortios_xutils
 import fortios_xutils.api
+import fortios_xutils.utils
 
 
 LOG = logging.getLogger("fortios_xutils")
 
 
+class FilePathOrGlob(click.Path):
+    """
+    Type of the arguments of input file paths or glob patterns. Glob patterns
+    are passed through as they are and expanded later, and file paths are
+    checked with click.Path.
+    """
+    name = "filepath_or_glob"
+
+    def convert(self, value, param, ctx):
+        """Check `value` with click.Path unless it's a glob pattern.
+        """
+        if '*' in str(value):
+            return value
+
+        return super().convert(value, param, ctx)
+
+
+# Input file paths are checked if exist, but not if readable to avoid calling
+# os.access in addition to os.stat, because they are opened later anyway.
+FILEPATHS_TYPE = FilePathOrGlob(exists=True, dir_okay=False)
+
+
+def _indent_output(indent=None):
+    """
+    :param indent: Indent JSON outputs if True, or detect it if None
+    :return: True if JSON outputs should be indented, i.e. stdout is a TTY
+    """
+    if indent is None:
+        return click.get_text_stream("stdout").isatty()
+
+    return indent
+
+
+def print_json(data, indent=None):
+    """
+    Print `data` as JSON to stdout. It's serialized to bytes and written at
+    once.
+
+    :param data: Data to print
+    :param indent:
+        Indent the output with two spaces if True, or only if stdout is a TTY
+        if None, not piped to other commands or files
+    """
+    indent = _indent_output(indent)
+    click.echo(fortios_xutils.utils.dumps_json(data, indent=indent))
+
+
+def print_json_list(items, indent=None):
+    """
+    Print `items` as a JSON list to stdout, same as :func:`print_json` does for
+    the list of `items`, but serialize and print each item one by one not to
+    keep all of them.
+
+    :param items: An iterable object yields items to print
+    :param indent: See :func:`print_json`
+    """
+    indent = _indent_output(indent)
+    (start, sep, end) = ((b"[\n  ", b",\n  ", b"\n]") if indent
+                         else (b"[", b",", b"]"))
+    head = start
+    for item in items:
+        content = fortios_xutils.utils.dumps_json(item, indent=indent)
+        if indent:
+            content = content.replace(b"\n", b"\n  ")
+
+        click.echo(head + content, nl=False)
+        head = sep
+
+    click.echo(b"[]" if head is start else end)
+
+
 @click.command()
-@click.argument("filepaths", nargs=-1,
-                type=click.Path(exists=True, readable=True))
+@click.argument("filepaths", nargs=-1, type=FILEPATHS_TYPE)
 @click.option("-O", "--outdir",
               help=("Output dir to save parsed results [out/ relative to "
                     "input filepath]"), default=None)
-def parse(filepaths, outdir):
+@click.option("-C", "--cache-dir",
+              help=("Dir to cache parsed results to skip parsing files not "
+                    "changed since the last run"), default=None)
+@click.option("-j", "--jobs", type=int,
+              help=("Number of processes to parse files in parallel "
+                    "[$FORTIOS_XUTILS_JOBS or the number of CPUs]"),
+              default=None)
+def parse(filepaths, outdir, cache_dir, jobs):
     """
     Parse fortigate CLI's "show *configuration* outputs and generate structured
     JSON files. FILEPATHS is a list of file paths or a glob pattern gives that.
@@ -71,13 +150,17 @@ def parse(filepaths, outdir):
         A list of path of the input fortios' "show *configuration" output
 
     :param outdir: Dir to save parsed results as JSON files
+    :param cache_dir: Dir to cache parsed results
+    :param jobs: Number of processes to parse files in parallel
     """
-    fortios_xutils.parse_and_save_show_configs(filepaths, outdir)
+    fortios_xutils.parse_and_save_show_configs(filepaths, outdir,
+                                               max_workers=jobs,
+                                               cache_dir=cache_dir,
+                                               paths_only=True)
 
 
 @click.command()
-@click.argument("filepaths", nargs=-1,
-                type=click.Path(exists=True, readable=True))
+@click.argument("filepaths", nargs=-1, type=FILEPATHS_TYPE)
 @click.option("-P", "--path", "path_exp", help="JMESPath expression to query")
 def search(filepaths, path_exp):
     """
@@ -108,20 +191,29 @@ def search(filepaths, path_exp):
         results
     :param path_exp: JMESPath expression to search for
     """
-    res = fortios_xutils.query_json_files(filepaths, path_exp)
+    if len(filepaths) == 1 and '*' not in filepaths[0]:
+        print_json(fortios_xutils.query_json_file(filepaths[0], path_exp))
+        return
 
-    if len(res) == 1:
-        print(anyconfig.dumps(res[0]["results"], ac_parser="json", indent=2))
+    itr = fortios_xutils.query_json_files_itr(filepaths, path_exp)
+    head = list(itertools.islice(itr, 2))
+
+    if len(head) == 1:
+        print_json(head[0][1])
     else:
-        print(anyconfig.dumps(res, ac_parser="json", indent=2))
+        print_json_list(dict(filepath=fpath, results=res) for fpath, res
+                        in itertools.chain(head, itr))
 
 
 @click.command()
-@click.argument("filepaths", nargs=-1,
-                type=click.Path(exists=True, readable=True))
+@click.argument("filepaths", nargs=-1, type=FILEPATHS_TYPE)
 @click.option("-O", "--outdir", help="Dir to save results")
 @click.option("-P", "--prefix", help="Max network prefix [24]")
-def network_collect(filepaths, outdir=False, prefix=24):
+@click.option("-j", "--jobs", type=int,
+              help=("Number of processes to collect networks in parallel "
+                    "[$FORTIOS_XUTILS_JOBS or the number of CPUs]"),
+              default=None)
+def network_collect(filepaths, outdir=False, prefix=24, jobs=None):
     """
     Collect and save network data from the parsed and structured fortigate's
     configuration files in JSON formats. FILEPATHS is a list of path of the
@@ -151,14 +243,19 @@ def network_collect(filepaths, outdir=False, prefix=24):
         fortios' "show *configuration" outputs
     :param outdir: Dir to save outputs [same dir input files exist]
     :param prefix: Max network prefix to search networks for
+    :param jobs: Number of processes to collect networks in parallel
     """
-    fortios_xutils.collect_and_save_networks(filepaths, outdir=outdir,
-                                             prefix=prefix)
+    opts = dict(outdir=outdir, prefix=prefix, max_workers=jobs)
+
+    # Drain the results as they are ready without keeping them.
+    collections.deque(
+        fortios_xutils.collect_and_save_networks_itr(filepaths, **opts),
+        maxlen=0
+    )
 
 
 @click.command()
-@click.argument("filepaths", nargs=-1,
-                type=click.Path(exists=True, readable=True))
+@click.argument("filepaths", nargs=-1, type=FILEPATHS_TYPE)
 @click.option("-o", "--outpath",
               help="Path of the outpath file to save network JSON data",
               default=None)
@@ -197,12 +294,23 @@ def network_compose(filepaths, outpath):
 
 
 @click.command()
-@click.argument("filepaths", nargs=-1,
-                type=click.Path(exists=True, readable=True))
+@click.argument("filepaths", nargs=-1, type=FILEPATHS_TYPE)
 @click.option("-o", "--outname", help="Output file name")
 @click.option("-O", "--outdir",
               help="Dir to save results [same dir input files exist]")
-def firewall_policy_save(filepaths, outname=None, outdir=None):
+@click.option("-j", "--jobs", type=int,
+              help=("Number of processes to make and save tables in parallel "
+                    "[$FORTIOS_XUTILS_JOBS or the number of CPUs]"),
+              default=None)
+@click.option("-c", "--compression",
+              type=click.Choice(sorted(
+                  fortios_xutils.utils.COMPRESSION_METHODS
+              )),
+              help=("Compression method to save results; the file extension "
+                    "of it is added to the output file name [not compressed]"),
+              default=None)
+def firewall_policy_save(filepaths, outname=None, outdir=None, jobs=None,
+                         compression=None):
     """
     Make and save firewall policy table (:class:`pandas.DataFrame` object).
 
@@ -222,8 +330,11 @@ def firewall_policy_save(filepaths, outname=None, outdir=None):
         "show *configuration" outpath
     :param outname: Output file name
     :param outdir: Dir to save outputs [same dir input files exist]
+    :param jobs: Number of processes to make and save tables in parallel
+    :param compression: Compression method to save results
     """
-    opts = dict(outname=outname, outdir=outdir)
+    opts = dict(outname=outname, outdir=outdir, max_workers=jobs,
+                compression=compression, paths_only=True)
     fortios_xutils.make_and_save_firewall_policy_tables(filepaths, **opts)
 
 
@@ -277,7 +388,7 @@ def firewall_policy_search(filepath, ip_s):
     rdf = fortios_xutils.load_firewall_policy_table(filepath)
     res = fortios_xutils.search_firewall_policy_table_by_addr(ip_s, rdf)
 
-    print(anyconfig.dumps(res, ac_parser="json", indent=2))
+    print_json(res)
 
 
 @click.command()
@@ -346,8 +457,7 @@ def network_find_paths(filepath, src_ip, dst_ip, ntype=None):
     """
     res = fortios_xutils.find_network_paths(filepath, src_ip, dst_ip)
 
-    aopts = dict(ac_parser="json", indent=2)
-    print(anyconfig.dumps(res, **aopts))
+    print_json(res)
 
 
 @click.group()
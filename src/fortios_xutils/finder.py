@@ -6,8 +6,12 @@ r"""Find network nodes.
 """
 from __future__ import absolute_import
 
+import collections
 import collections.abc
 import functools
+import ipaddress
+import logging
+import weakref
 
 import networkx
 
@@ -15,6 +19,13 @@ from . import netutils, utils
 from .network import NODE_ANY
 
 
+LOG = logging.getLogger(__name__)
+
+# Cache of :func:`make_net_index` keyed by graphs, which is kept out of the
+# graphs not to be pickled and exported with them.
+_NET_INDEXES = weakref.WeakKeyDictionary()
+
+
 def validate(cnf, filepath='N/A'):
     """
     Validate `cnf` to fail first.
@@ -40,28 +51,38 @@ def validate(cnf, filepath='N/A'):
                          "found in {}".format(filepath))
 
 
-@functools.lru_cache(maxsize=8)
+@utils.file_cache(maxsize=16)
 def load(filepath):
     """
     :param filepath:
         A str or :class:`pathlib.Path` object gives a path of network graph
         data ({'nodes': ..., 'links': ...}) in JSON or YAML formats
 
-    :param ac_args: keyword arguments given to anyconfig.load
-
-    :return: An instance of networkx.Graph
+    :return:
+        An instance of networkx.Graph, which is cached and shared among the
+        callers until the file `filepath` is changed. Callers must not modify
+        it; :func:`fortios_xutils.api.load_network_graph` returns a copy of it
+        instead.
     """
-    cnf = utils.try_ac_load(filepath)
+    cnf = utils.load_file(filepath)
     validate(cnf, filepath)
 
     graph = networkx.Graph()
-    graph.add_nodes_from((n["id"], n) for n in cnf["nodes"])
-    for edge in cnf["links"]:
-        graph.add_edge(edge["source"], edge["target"], **edge)
+    graph.add_nodes_from([(n["id"], n) for n in cnf["nodes"]])
+    graph.add_edges_from([(e["source"], e["target"], e) for e in cnf["links"]])
 
     return graph
 
 
+@functools.lru_cache(maxsize=4096)
+def _prefixlen(addr):
+    """
+    :param addr: A str represents an ip address or network
+    :return: The prefix length of the network `addr`
+    """
+    return netutils.to_network(addr).prefixlen
+
+
 def graph_nodes_itr(graph):
     """
     :param graph: A networkx.Graph object
@@ -83,6 +104,64 @@ def find_nodes_by_ip_itr(nodes, ipa):
             yield node
 
 
+def make_net_index(graph):
+    """
+    Make an index to find nodes by ip address quickly.
+
+    :param graph: A networkx.Graph object
+    :return:
+        A mapping object of {prefix: {network address as an int: [(the
+        position of the node in the graph, node)]}}
+    """
+    index = {}
+
+    for pos, node in enumerate(graph_nodes_itr(graph)):
+        for addr in node.get("addrs", []):
+            try:
+                net = netutils.to_network(addr)
+            except ValueError:
+                LOG.warning("Ignored the invalid address of the node %s: %r",
+                            node.get("id"), addr)
+                continue
+
+            nets = index.setdefault(net.prefixlen, {})
+            nets.setdefault(int(net.network_address), []).append((pos, node))
+
+    return index
+
+
+def get_net_index(graph):
+    """
+    :param graph: A networkx.Graph object
+    :return:
+        The index made by :func:`make_net_index`, which is cached while
+        `graph` is alive
+    """
+    index = _NET_INDEXES.get(graph)
+    if index is None:
+        index = _NET_INDEXES[graph] = make_net_index(graph)
+
+    return index
+
+
+def find_nodes_by_ip_in_index(index, ipa):
+    """
+    :param index: An index made by :func:`make_net_index`
+    :param ipa: A str gives an ip address
+
+    :return: A list of nodes of which addrs contain `ipa` in the graph order
+    """
+    ip_int = int(ipaddress.ip_interface(netutils.normalize_ip(ipa)).ip)
+    hits = dict()
+
+    for prefix, nets in index.items():
+        mask = (0xffffffff << (32 - prefix)) & 0xffffffff
+        for pos, node in nets.get(ip_int & mask, []):
+            hits[pos] = node
+
+    return [hits[pos] for pos in sorted(hits)]
+
+
 def find_net_nodes_by_ip(filepath, ipa):
     """
     :param filepath:
@@ -101,11 +180,10 @@ def find_net_nodes_by_ip(filepath, ipa):
         sort network address list.
         """
         addr = node["addrs"][0]  # Net nodes should have an addr in addrs only.
-        return netutils.to_network(addr).prefixlen
+        return _prefixlen(addr)
 
-    nodes = graph_nodes_itr(load(filepath))
-    return sorted(find_nodes_by_ip_itr(nodes, ipa), key=_net_key_fun,
-                  reverse=True)
+    nodes = find_nodes_by_ip_in_index(get_net_index(load(filepath)), ipa)
+    return sorted(nodes, key=_net_key_fun, reverse=True)
 
 
 def find_a_net_node_by_ip(filepath, ipa):
@@ -152,6 +230,13 @@ def find_paths_itr(filepath, src, dst, node_type=False, **nx_opts):
 
     :yield: A lists of nodes in the found paths
     :raises: ValueError if given src and/or dst is not an IP address string
+
+    .. note::
+       Nodes in each path are in the order from `src` to `dst`, and paths
+       filtered by `node_type` are regarded as duplicates only if the filtered
+       nodes are same in this order. Nodes were in the order in the graph
+       before and the outputs of the network-find-paths command change
+       accordingly.
     """
     src_net = find_a_net_node_by_ip(filepath, src)
     dst_net = find_a_net_node_by_ip(filepath, dst)
@@ -159,9 +244,10 @@ def find_paths_itr(filepath, src, dst, node_type=False, **nx_opts):
     if not src_net or not dst_net:
         return
 
+    no_filter = not node_type or node_type == NODE_ANY
+
     if src_net == dst_net:
-        if not node_type or (node_type and node_type != NODE_ANY and
-                             src_net["type"] == node_type):
+        if no_filter or src_net["type"] == node_type:
             yield [src_net]
 
         return
@@ -169,16 +255,20 @@ def find_paths_itr(filepath, src, dst, node_type=False, **nx_opts):
     graph = load(filepath)
     nss = networkx.all_shortest_paths(graph, src_net["id"], dst_net["id"],
                                       **nx_opts)
-    res = [[n for n in graph_nodes_itr(graph) if n["id"] in ns] for ns in nss]
+    nodes = graph.nodes
 
-    if node_type and node_type != NODE_ANY:
-        # Those paths might be degenerated and need to remove duplicates.
-        pitr = ([n for n in ns if n["type"] == node_type] for ns in res)
-        res = list(select_unique_paths_itr(pitr))
+    if no_filter:
+        for nids in nss:
+            yield [nodes[nid] for nid in nids]
+        return
 
-    for npath in res:
-        # yield [src_net] + npath + [dst_net]
-        yield npath
+    # Those paths might be degenerated and need to remove duplicates.
+    seen = set()
+    for nids in nss:
+        fnids = tuple(nid for nid in nids if nodes[nid]["type"] == node_type)
+        if fnids not in seen:
+            seen.add(fnids)
+            yield [nodes[nid] for nid in fnids]
 
 
 def find_paths(filepath, src, dst, node_type=False, **nx_opts):
@@ -194,8 +284,10 @@ def find_paths(filepath, src, dst, node_type=False, **nx_opts):
         Keyword options given to networkx.all_shortest_paths() such as method,
         and weight
 
-    :yield: A lists of nodes in the found paths
+    :return: A list of lists of nodes in the found paths
     :raises: ValueError if given src and/or dst is not an IP address string
+
+    .. seealso:: :func:`find_paths_itr` for the order of nodes in the paths
     """
     return list(find_paths_itr(filepath, src, dst, node_type=node_type,
                                **nx_opts))
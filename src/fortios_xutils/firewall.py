@@ -10,10 +10,14 @@ r"""Parse fortios' `show *configuration' outputs and generates various outputs.
 """
 from __future__ import absolute_import
 
+import collections
 import functools
+import importlib.util
 import itertools
 import os.path
+import weakref
 
+import numpy
 import pandas
 
 from . import netutils, parser, utils
@@ -28,7 +32,36 @@ ADDRS_COL_NAMES = ("addrs", "srcaddrs", "dstaddrs")
 FWP_TABLE_FILENAME = "firewall_policy_table.data.json"
 
 # .. seealso:: :func:`pandas.DataFrame.to_json`
-COMPRESSION_EXTS = set("gz bz2 zip xz".split())
+COMPRESSION_EXTS = set(utils.COMPRESSION_METHODS.values())
+
+# Keyword options given to :meth:`pandas.DataFrame.to_<file type>` methods.
+# Parquet and Feather files (requires pyarrow or fastparquet) are compressed
+# with zstd, which makes files smaller than the defaults, snappy and lz4.
+PANDAS_SAVE_OPTS = dict(parquet=dict(compression="zstd"),
+                        feather=dict(compression="zstd"))
+
+# File types of which columns must have values of the same type in all rows.
+_COLUMNAR_FILE_TYPES = ("parquet", "feather")
+
+# Options of compression methods to save files, which prefer speed to ratio.
+# gzip compresses several times faster at level 1 than at the default, 9.
+COMPRESSION_OPTS = dict(gzip=dict(compresslevel=1))
+
+# Compression methods keyed by the file extensions.
+_COMPRESSION_BY_EXTS = {ext: method for method, ext
+                        in utils.COMPRESSION_METHODS.items()}
+
+# Keyword options given to pandas.read_<file type> functions. Parquet files
+# are memory mapped instead of read into buffers. These are options for
+# pyarrow and not given if it's not available, e.g. only fastparquet is.
+PANDAS_LOAD_OPTS = dict(parquet=dict(engine="pyarrow", memory_map=True))
+
+# Cache of the results of :func:`make_addr_ranges` keyed by (id(tbl_df),
+# addrs_cols). Each item is removed when the table is garbage collected.
+_ADDR_RANGES = {}
+
+# Cache of the results of :func:`make_addr_index` same as the above.
+_ADDR_INDEXES = {}
 
 
 def df_by_query(path_exp, data, normalize_fn=None,
@@ -51,7 +84,7 @@ def df_by_query(path_exp, data, normalize_fn=None,
     )
 
 
-def normalize_fa(fa_dict):
+def normalize_fa(fa_dict, ipa=None):
     """
     It seems that there are the following types of firewall address 'edit'
     configurations.
@@ -78,6 +111,11 @@ def normalize_fa(fa_dict):
       {"edit": <edit_id :: int>, "uuid": ...,
        "associated-interface": <interface_name>,  # 'system interface' list
        "subnet": [<ip_address>, <netmask>]}
+
+    :param fa_dict: A mapping object represents a firewall address
+    :param ipa:
+        The ip address converted from the 'subnet' of `fa_dict` already if
+        given, see :func:`normalize_fas`
     """
     if "start-ip" in fa_dict:  # iprange
         ipset = netutils.iprange_to_ipsets(fa_dict["start-ip"],
@@ -86,7 +124,9 @@ def normalize_fa(fa_dict):
         fa_dict["addrs"] = ipset  # or? ' '.join(ipset)
 
     elif "subnet" in fa_dict:  # ip address or ip network
-        ipa = netutils.subnet_to_ip(*fa_dict["subnet"])  # :: str
+        if ipa is None:
+            ipa = netutils.subnet_to_ip(*fa_dict["subnet"])  # :: str
+
         if netutils.is_network_address(ipa):
             fa_dict["addr_type"] = IP_NETWORK
         else:
@@ -100,48 +140,108 @@ def normalize_fa(fa_dict):
     return fa_dict
 
 
-def make_firewall_address_table_1(cnf, has_vdoms_=False, vdom=None):
+def normalize_fas(fa_dicts):
+    """
+    Normalize firewall addresses same as :func:`normalize_fa` does for each of
+    them, but convert the 'subnet's of them at once.
+
+    :param fa_dicts: A list of mapping objects represent firewall addresses
+    :return: A list of normalized `fa_dicts`
+    """
+    sfas = [fa for fa in fa_dicts if "subnet" in fa and "start-ip" not in fa]
+    ipas = netutils.subnets_to_ips([fa["subnet"] for fa in sfas])
+    ipa_by_ids = {id(fa): ipa for fa, ipa in zip(sfas, ipas)}
+
+    return [normalize_fa(fa, ipa_by_ids.get(id(fa))) for fa in fa_dicts]
+
+
+def df_by_config_edits(cname, configs, normalize_fn=None):
+    """
+    Make :class:`pandas.DataFrame` object from the edits of a configuration.
+
+    :param cname: Name of the configuration, e.g. 'firewall address'
+    :param configs:
+        A mapping object of {config_name: [edit]} made by
+        :func:`fortios_xutils.parser.extract_configs`
+    :param normalize_fn: A callable to normalize each edit if given
+
+    :return: A :class:`pandas.DataFrame` object
+    """
+    edits = configs.get(cname, [])
+    if callable(normalize_fn):
+        edits = [normalize_fn(e) for e in edits]
+
+    return pandas.DataFrame(edits)
+
+
+def _extract_configs(cnf, has_vdoms_=False, vdom=None, configs=None):
+    """
+    :return: `configs` if given, or the configs extracted from `cnf`
+    """
+    if configs is None:
+        return parser.extract_configs(cnf, has_vdoms_=has_vdoms_, vdom=vdom)
+
+    return configs
+
+
+def make_firewall_address_table_1(cnf, has_vdoms_=False, vdom=None,
+                                  configs=None):
     """
     :param cnf: A mapping object contains firewall configurations
     :param has_vdoms: True if givne `cnf` contains vdoms
     :param vdom: Specify vdom to make table
+    :param configs:
+        The configs extracted from `cnf` by
+        :func:`fortios_xutils.parser.extract_configs` to reuse if given
 
     :return: A :class:`pandas.DataFrame` object
     """
-    rdf = df_by_query("configs[?config==`firewall address`].edits[]",
-                      cnf, normalize_fn=normalize_fa,
-                      has_vdoms_=has_vdoms_, vdom=vdom)
-    return rdf
+    configs = _extract_configs(cnf, has_vdoms_, vdom, configs)
+    return pandas.DataFrame(normalize_fas(configs.get("firewall address",
+                                                      [])))
 
 
-def make_firewall_addrgrp_table(cnf, has_vdoms_=False, vdom=None):
+def make_firewall_addrgrp_table(cnf, has_vdoms_=False, vdom=None,
+                                configs=None):
     """
     :param cnf: A mapping object contains firewall configurations
     :param has_vdoms: True if givne `cnf` contains vdoms
     :param vdom: Specify vdom to make table
+    :param configs: See :func:`make_firewall_address_table_1`
 
     :return: A :class:`pandas.DataFrame` object
     """
-    keys = ["edit", "uuid", "member"]
-    rdf = df_by_query("configs[?config==`firewall addrgrp`].edits[]",
-                      cnf, normalize_fn=None,
-                      has_vdoms_=has_vdoms_, vdom=vdom
-                      )
-    if rdf.empty:
-        return rdf
+    configs = _extract_configs(cnf, has_vdoms_, vdom, configs)
+    ags = configs.get("firewall addrgrp", [])
+    if not ags:
+        return pandas.DataFrame()
+
+    # Same as pandas.DataFrame(ags).explode("member")[keys] but without the
+    # intermediate tables.
+    members = [ag.get("member", numpy.nan) for ag in ags]
+    members = [(m or [numpy.nan]) if isinstance(m, list) else [m]
+               for m in members]
+    counts = [len(m) for m in members]
 
-    return rdf.explode("member")[keys].reset_index(drop=True)
+    return pandas.DataFrame({
+        key: numpy.repeat(numpy.array([ag.get(key, numpy.nan) for ag in ags],
+                                      dtype=object), counts)
+        for key in ("edit", "uuid")
+    }).assign(member=list(itertools.chain.from_iterable(members)))
 
 
-def make_firewall_address_table(cnf, has_vdoms_=False, vdom=None):
+def make_firewall_address_table(cnf, has_vdoms_=False, vdom=None,
+                                configs=None):
     """
     :param cnf: A mapping object contains firewall configurations
     :param has_vdoms: True if givne `cnf` contains vdoms
     :param vdom: Specify vdom to make table
+    :param configs: See :func:`make_firewall_address_table_1`
 
     :return: A :class:`pandas.DataFrame` object
     """
-    opts = dict(has_vdoms_=has_vdoms_, vdom=vdom)
+    opts = dict(has_vdoms_=has_vdoms_, vdom=vdom,
+                configs=_extract_configs(cnf, has_vdoms_, vdom, configs))
 
     df_fa = make_firewall_address_table_1(cnf, **opts)
     df_ag = make_firewall_addrgrp_table(cnf, **opts)
@@ -149,50 +249,102 @@ def make_firewall_address_table(cnf, has_vdoms_=False, vdom=None):
     if df_ag.empty:
         return df_fa
 
-    # Add columns (addr*, ...) from df_fa
-    df_diff = pandas.merge(
-        df_ag, df_fa, left_on="member", right_on="edit",
-        suffixes=('', '_r'), how="left"
-    ).drop(columns="edit_r").drop(columns="uuid_r").drop(columns="member")
+    edits = pandas.Index(df_fa["edit"])
+    if not edits.is_unique:
+        # Add columns (addr*, ...) from df_fa
+        df_diff = pandas.merge(
+            df_ag, df_fa, left_on="member", right_on="edit",
+            suffixes=('', '_r'), how="left"
+        ).drop(columns=["edit_r", "uuid_r", "member"])
+
+        return pandas.concat([df_fa, df_diff], sort=False)
+
+    # Take the rows of df_fa and the rows of the members of groups, of which
+    # edit and uuid are replaced with the groups', at once.
+    (nfa, nag) = (len(df_fa), len(df_ag))
+    rdf = df_fa.reset_index(drop=True).reindex(
+        numpy.concatenate([numpy.arange(nfa),
+                           edits.get_indexer(df_ag["member"])])
+    )
+    for col in ("edit", "uuid"):
+        rdf.iloc[nfa:, rdf.columns.get_loc(col)] = df_ag[col].to_numpy()
+
+    rdf.index = df_fa.index.append(pandas.RangeIndex(nag))
+    return rdf
+
+
+def make_addrs_map(df_fa=DF_ZERO):
+    """
+    :param df_fa: A :class:`pandas.DataFrame` object holds firewall addresses
+
+    :return:
+        A dict of {edit: A sorted list of str gives IP addresses with prefix}
+    """
+    if df_fa.empty or "addrs" not in df_fa.columns:
+        return {}
+
+    res = collections.defaultdict(list)
+    for edit, addrs in zip(df_fa["edit"].tolist(), df_fa["addrs"].tolist()):
+        if isinstance(addrs, list) and addrs:  # Not NaN or empty.
+            res[edit].extend(addrs)
 
-    return pandas.concat([df_fa, df_diff], sort=False)
+    return {edit: sorted(addrs) for edit, addrs in res.items()}
 
 
-def get_firewall_address_by_edit(edit, df_fa=DF_ZERO):
+def get_firewall_address_by_edit(edit, df_fa=DF_ZERO, addrs_map=None):
     """
     :param edit: A str gives an edit ID
     :param df_fa: A :class:`pandas.DataFrame` object holds firewall addresses
+    :param addrs_map:
+        A mapping object made by :func:`make_addrs_map` from `df_fa`, made on
+        demand if it's not given
 
     :return: A list of str gives IP addresses with prefix
     """
-    return sorted(itertools.chain.from_iterable(
-        e["addrs"] for e
-        in df_fa[df_fa["edit"] == edit].fillna('').to_dict(orient="records")
-        if e.get("addrs")
-    ))
+    if addrs_map is None:
+        addrs_map = make_addrs_map(df_fa)
+
+    return list(addrs_map.get(edit, []))
 
 
-def get_firewall_address_by_edits(edits, df_fa=DF_ZERO):
+def get_firewall_address_by_edits(edits, df_fa=DF_ZERO, addrs_map=None):
     """
     :param edits: A edit or a list of edits
     :param df_fa: A :class:`pandas.DataFrame` object holds firewall addresses
+    :param addrs_map:
+        See :func:`get_firewall_address_by_edit`. The results of lists of edits
+        are cached in it also, keyed by tuples of the edits, because many
+        policies refer to the same list of edits usually.
 
     :return: A list of str gives IP addresses with prefix
     """
+    if addrs_map is None:
+        addrs_map = make_addrs_map(df_fa)
+
     if utils.is_str(edits):
-        return get_firewall_address_by_edit(edits, df_fa)
+        return get_firewall_address_by_edit(edits, addrs_map=addrs_map)
 
-    return sorted(itertools.chain.from_iterable(
-        get_firewall_address_by_edit(e, df_fa=df_fa) for e in edits
-    ))
+    key = tuple(edits)
+    res = addrs_map.get(key)
+    if res is None:
+        res = addrs_map[key] = sorted(itertools.chain.from_iterable(
+            addrs_map.get(e, []) for e in edits
+        ))
+
+    return list(res)
 
 
-def resolv_src_and_dst_in_fp(fp_dict, df_fa=DF_ZERO):
+def resolv_src_and_dst_in_fp(fp_dict, df_fa=DF_ZERO, addrs_map=None):
     """
     :param fp_dict: A mapping object represents a firewall policy
     :param df_fa: A :class:`pandas.DataFrame` object holds firewall addresses
+    :param addrs_map: See :func:`get_firewall_address_by_edit`
     """
-    fnc = functools.partial(get_firewall_address_by_edits, df_fa=df_fa)
+    if addrs_map is None:
+        addrs_map = make_addrs_map(df_fa)
+
+    fnc = functools.partial(get_firewall_address_by_edits,
+                            addrs_map=addrs_map)
 
     srcaddr = fp_dict.get("srcaddr", False)
     if srcaddr:
@@ -205,25 +357,22 @@ def resolv_src_and_dst_in_fp(fp_dict, df_fa=DF_ZERO):
     return fp_dict
 
 
-def make_firewall_policy_table_1(cnf, df_fa, has_vdoms_=False, vdom=None):
+def make_firewall_policy_table_1(cnf, df_fa, has_vdoms_=False, vdom=None,
+                                 configs=None):
     """
     :param cnf: A mapping object contains firewall configurations
     :param df_fa: A :class:`pandas.DataFrame` object holds firewall addresses
     :param has_vdoms: True if givne `cnf` contains vdoms
     :param vdom: Specify vdom to make table
+    :param configs: See :func:`make_firewall_address_table_1`
 
     :return: A :class:`pandas.DataFrame` object
     """
-    fa_keys = ["edit", "addr", "addrs", "comment"]  # TBD
-    df_fa = df_fa.drop(columns=[k for k in df_fa.columns if k not in fa_keys])
-
-    fnc = functools.partial(resolv_src_and_dst_in_fp, df_fa=df_fa)
+    fnc = functools.partial(resolv_src_and_dst_in_fp,
+                            addrs_map=make_addrs_map(df_fa))
 
-    df_fp = df_by_query("configs[?config==`firewall policy`].edits[]",
-                        cnf, normalize_fn=fnc,
-                        has_vdoms_=has_vdoms_, vdom=vdom)
-
-    return df_fp
+    configs = _extract_configs(cnf, has_vdoms_, vdom, configs)
+    return df_by_config_edits("firewall policy", configs, normalize_fn=fnc)
 
 
 def make_firewall_policy_table(filepath, vdom=None):
@@ -234,7 +383,9 @@ def make_firewall_policy_table(filepath, vdom=None):
     :return: A :class:`pandas.DataFrame` object
     """
     cnf = parser.load(filepath)
-    opts = dict(has_vdoms_=parser.has_vdom(cnf), vdom=vdom)
+    has_vdoms_ = parser.has_vdom(cnf)
+    configs = parser.extract_configs(cnf, has_vdoms_=has_vdoms_, vdom=vdom)
+    opts = dict(has_vdoms_=has_vdoms_, vdom=vdom, configs=configs)
 
     df_fa = make_firewall_address_table(cnf, **opts)
     rdf = make_firewall_policy_table_1(cnf, df_fa, **opts)
@@ -242,26 +393,20 @@ def make_firewall_policy_table(filepath, vdom=None):
     return rdf
 
 
-def make_firewall_policy_tables(filepaths, vdom=None):
+def make_firewall_policy_tables(filepaths, vdom=None, max_workers=None):
     """
     :param filepath: Path to the JSON file contains fortigate's configurations
     :param vdom: Specify vdom to make table
+    :param max_workers:
+        Max number of processes to make tables in parallel; the number of CPUs
+        by default, and tables are made serially if it's 1.
 
-    :return: A list of :class:`pandas.DataFrame` object
-    """
-    return [make_firewall_policy_table(f, vdom=vdom) for f in filepaths]
-
-
-def _get_exts(filepath):
-    """
-    >>> _get_exts("/a/b.pickle.gz")
-    ['gz', 'pickle']
-    >>> _get_exts("/a/b.pickle")
-    ['pickle']
-    >>> _get_exts("/a/b/c")
-    []
+    :return:
+        A list of :class:`pandas.DataFrame` object, which are copied back in
+        full from the worker processes and kept in the list
     """
-    return list(reversed(os.path.basename(filepath).split('.')[1:]))
+    fnc = functools.partial(make_firewall_policy_table, vdom=vdom)
+    return utils.pmap(fnc, filepaths, max_workers=max_workers, chunksize=2)
 
 
 def guess_file_type(filepath):
@@ -280,36 +425,78 @@ def guess_file_type(filepath):
     'json'
     >>> guess_file_type("c.pickle")
     'pickle'
+    >>> guess_file_type("c.gz")  # doctest: +IGNORE_EXCEPTION_DETAIL
+    Traceback (most recent call last):
+    ValueError: ...
     """
     fname = os.path.basename(filepath)
-    exts = _get_exts(fname)
+    (head, sep, ext) = fname.rpartition('.')
 
-    if not exts or '.' not in fname:
+    if not sep:
         raise ValueError("Unknown file type: " + fname)
 
-    if exts[0] in COMPRESSION_EXTS:
-        if len(exts) < 2:
+    if ext in COMPRESSION_EXTS:
+        (_head, sep, ext) = head.rpartition('.')
+        if not sep:
             raise ValueError("Invalid file type: " + fname)
 
-        return exts[1]
+    return ext
+
+
+def _make_list_columns_uniform(rdf):
+    """
+    Make the values of the columns have lists in some rows lists in all rows,
+    e.g. 'srcaddr' of firewall policies may have a str or a list of str,
+    because columnar file formats cannot save columns of mixed types.
+
+    :param rdf: A :class:`pandas.DataFrame` object
+    :return: `rdf` or a copy of it of which list columns were made uniform
+
+    >>> rdf = pandas.DataFrame(dict(a=["x", ["y", "z"], None], b=[1, 2, 3]))
+    >>> _make_list_columns_uniform(rdf).to_dict(orient="list")
+    {'a': [['x'], ['y', 'z'], None], 'b': [1, 2, 3]}
+    """
+    cols = [col for col in rdf.columns
+            if rdf[col].dtype == object and
+            any(isinstance(val, list) for val in rdf[col])]
+    if not cols:
+        return rdf
 
-    return exts[0]
+    return rdf.assign(**{
+        col: [val if isinstance(val, list) or val is None
+              else (None if pandas.isna(val) else [val]) for val in rdf[col]]
+        for col in cols
+    })
 
 
 def pandas_save(rdf, outpath):
     """
     :param rdf: A :class:`pandas.DataFrame` object
     :param outpath: Output file path
+
+    .. note::
+       Values of the columns have lists in some rows, e.g. 'srcaddr', are
+       saved as lists in all rows in Parquet and Feather files.
     """
     ftype = guess_file_type(outpath)
+    if ftype in _COLUMNAR_FILE_TYPES:
+        rdf = _make_list_columns_uniform(rdf)
+
     try:
         save_fn = getattr(rdf, "to_{}".format(ftype))
     except AttributeError:
         raise ValueError("Looks an invalid filetype: outpath={}, "
                          "(detected/given) filetype={}".format(outpath, ftype))
 
+    opts = PANDAS_SAVE_OPTS.get(ftype, {})
+    if "compression" not in opts:
+        method = _COMPRESSION_BY_EXTS.get(os.path.splitext(outpath)[-1][1:])
+        if method in COMPRESSION_OPTS:
+            opts = dict(opts, compression=dict(method=method,
+                                               **COMPRESSION_OPTS[method]))
+
     utils.ensure_dir_exists(outpath)
-    save_fn(outpath)
+    save_fn(outpath, **opts)
 
 
 def make_and_save_firewall_policy_table(filepath, outpath, vdom=None):
@@ -327,36 +514,97 @@ def make_and_save_firewall_policy_table(filepath, outpath, vdom=None):
 
 
 def make_and_save_firewall_policy_tables_itr(filepaths, outname=None,
-                                             outdir=False, vdom=None):
+                                             outdir=False, vdom=None,
+                                             compression=None):
     """
     :param filepath: Path to the JSON file contains fortigate's configurations
     :param outpath: Output file path for the first filepath
     :param outdir: Dir to save outputs [same dir input files exist]
     :param vdom: Specify vdom to make table
+    :param compression:
+        Compression method to save outputs, see utils.COMPRESSION_METHODS
 
     :return: A generator yields :class:`pandas.DataFrame` object
     """
-    oname = outname if outname else FWP_TABLE_FILENAME
+    oname = utils.add_compression_ext(outname or FWP_TABLE_FILENAME,
+                                      compression)
 
     for fpath, outpath in utils.get_io_paths(filepaths, oname, outdir=outdir):
         yield make_and_save_firewall_policy_table(fpath, outpath, vdom=vdom)
 
 
+def _make_and_save_firewall_policy_table(io_paths, vdom=None,
+                                         paths_only=False):
+    """
+    An wrapper for :func:`make_and_save_firewall_policy_table` takes a pair of
+    input and output paths to be called from worker processes.
+
+    :return: The table or the output path only if `paths_only`
+    """
+    rdf = make_and_save_firewall_policy_table(*io_paths, vdom=vdom)
+    return io_paths[1] if paths_only else rdf
+
+
 def make_and_save_firewall_policy_tables(filepaths, outname=None, outdir=False,
-                                         vdom=None):
+                                         vdom=None, max_workers=None,
+                                         compression=None, paths_only=False):
     """
     :param filepath: Path to the JSON file contains fortigate's configurations
     :param outname: Output file name for the first filepath
     :param outdir: Dir to save outputs [same dir input files exist]
     :param vdom: Specify vdom to make table
+    :param max_workers:
+        Max number of processes to make tables in parallel; the number of CPUs
+        by default, and tables are made serially if it's 1.
+    :param compression:
+        Compression method to save outputs, see utils.COMPRESSION_METHODS
+    :param paths_only:
+        Return the output file paths only if True. The tables are copied back
+        in full from the worker processes and kept in a list otherwise.
 
-    :return: A list of :class:`pandas.DataFrame` objects
+    :return:
+        A list of :class:`pandas.DataFrame` objects, or the output file paths
+        if `paths_only`
     """
-    return list(
-        make_and_save_firewall_policy_tables_itr(
-            filepaths, outname=outname, outdir=outdir, vdom=vdom
-        )
-    )
+    oname = utils.add_compression_ext(outname or FWP_TABLE_FILENAME,
+                                      compression)
+    iopaths = utils.get_io_paths(filepaths, oname, outdir=outdir)
+    fnc = functools.partial(_make_and_save_firewall_policy_table, vdom=vdom,
+                            paths_only=paths_only)
+
+    return utils.pmap(fnc, iopaths, max_workers=max_workers, chunksize=2)
+
+
+def _has_pyarrow():
+    """
+    :return: True if pyarrow is available
+    """
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _arrays_to_lists(rdf):
+    """
+    Convert arrays in the columns of `rdf` to lists, which lists saved in
+    columnar file formats are loaded as.
+
+    :param rdf: A :class:`pandas.DataFrame` object
+    :return: `rdf` or a copy of it of which arrays were converted to lists
+
+    >>> rdf = pandas.DataFrame(dict(a=[numpy.array(["x"]), None], b=[1, 2]))
+    >>> _arrays_to_lists(rdf).to_dict(orient="list")
+    {'a': [['x'], None], 'b': [1, 2]}
+    """
+    cols = [col for col in rdf.columns
+            if rdf[col].dtype == object and
+            any(isinstance(val, numpy.ndarray) for val in rdf[col])]
+    if not cols:
+        return rdf
+
+    return rdf.assign(**{
+        col: [val.tolist() if isinstance(val, numpy.ndarray) else val
+              for val in rdf[col]]
+        for col in cols
+    })
 
 
 def pandas_load(inpath):
@@ -370,18 +618,112 @@ def pandas_load(inpath):
         raise ValueError("Looks an invalid filetype: outpath={}, "
                          "(detected/given) filetype={}".format(inpath, ftype))
 
-    return load_fn(inpath)
+    opts = PANDAS_LOAD_OPTS.get(ftype, {})
+    if opts.get("engine") == "pyarrow" and not _has_pyarrow():
+        opts = {}  # Let pandas choose the other engine.
+
+    rdf = load_fn(inpath, **opts)
+    if ftype in _COLUMNAR_FILE_TYPES:
+        return _arrays_to_lists(rdf)
 
+    return rdf
 
+
+@utils.file_cache(maxsize=16)
 def load_firewall_policy_table(filepath):
     """
     :param filepath: Path to the JSON file contains fortigate's configurations
 
-    :return: A :class:`pandas.DataFrame` object
+    :return:
+        A :class:`pandas.DataFrame` object, which is cached and shared among
+        the callers until the file `filepath` is changed. Callers must not
+        modify it; :func:`fortios_xutils.api.load_firewall_policy_table`
+        returns a copy of it instead.
     """
     return pandas_load(filepath)
 
 
+def _addr_ranges_itr(tbl_df, addrs_cols=ADDRS_COL_NAMES):
+    """
+    :param tbl_df: See :func:`search_by_addr_1`
+    :param addrs_cols: See :func:`search_by_addr_1`
+
+    :yield:
+        A tuple of (the first address, the last address, row position) of each
+        ip address in the columns `addrs_cols` of `tbl_df`
+    """
+    # The same addresses appear in many rows and columns usually.
+    ranges = {}
+
+    for col in addrs_cols:
+        if col not in tbl_df.columns:
+            continue
+
+        for pos, addrs in enumerate(tbl_df[col].values):
+            if utils.is_str(addrs):
+                addrs = [addrs] if addrs else []
+            elif not isinstance(addrs, (list, tuple, numpy.ndarray)):
+                continue  # NaN, None, etc.
+
+            for addr in addrs:
+                rng = ranges.get(addr)
+                if rng is None:
+                    net = netutils.to_network(addr)
+                    rng = ranges[addr] = (int(net.network_address),
+                                          int(net.broadcast_address))
+
+                yield (rng[0], rng[1], pos)
+
+
+def make_addr_ranges(tbl_df, addrs_cols=ADDRS_COL_NAMES):
+    """
+    Make arrays of ip address ranges in the table to search it by ip address.
+
+    :param tbl_df: See :func:`search_by_addr_1`
+    :param addrs_cols: See :func:`search_by_addr_1`
+
+    :return:
+        A tuple of :class:`numpy.ndarray` objects of (the first addresses, the
+        last addresses, row positions)
+    """
+    ranges = list(_addr_ranges_itr(tbl_df, addrs_cols))
+    if not ranges:
+        return (numpy.empty(0, dtype=numpy.uint32),
+                numpy.empty(0, dtype=numpy.uint32),
+                numpy.empty(0, dtype=numpy.intp))
+
+    (starts, ends, rows) = zip(*ranges)
+    return (numpy.array(starts, dtype=numpy.uint32),
+            numpy.array(ends, dtype=numpy.uint32),
+            numpy.array(rows, dtype=numpy.intp))
+
+
+def get_addr_ranges(tbl_df, addrs_cols=ADDRS_COL_NAMES):
+    """
+    Get the result of :func:`make_addr_ranges` cached while `tbl_df` is alive.
+
+    .. note:: The cache is not invalidated if `tbl_df` is modified in place.
+    """
+    key = (id(tbl_df), tuple(addrs_cols))
+    ranges = _ADDR_RANGES.get(key)
+    if ranges is None:
+        ranges = _ADDR_RANGES[key] = make_addr_ranges(tbl_df, addrs_cols)
+        weakref.finalize(tbl_df, _ADDR_RANGES.pop, key, None)
+
+    return ranges
+
+
+def match_addr_ranges(ip_int, starts, ends):
+    """
+    :param ip_int: An int represents an IP address
+    :param starts: A :class:`numpy.ndarray` of the first addresses
+    :param ends: A :class:`numpy.ndarray` of the last addresses
+
+    :return: A :class:`numpy.ndarray` of bools, True if the range contains it
+    """
+    return (starts <= ip_int) & (ip_int <= ends)
+
+
 def search_by_addr_1(ip_s, tbl_df, addrs_cols=ADDRS_COL_NAMES):
     """
     :param ip_s: A str represents an IP address
@@ -394,14 +736,130 @@ def search_by_addr_1(ip_s, tbl_df, addrs_cols=ADDRS_COL_NAMES):
     if not utils.is_str(ip_s):
         raise ValueError("Expected a str but: {!r}".format(ip_s))
 
-    ip_s = netutils.normalize_ip(ip_s)
+    ip_int = int(netutils.to_network(ip_s).network_address)
 
-    # TODO: I don't know how to accomplish this with pandas.DataFrame.
-    rdf = tbl_df.fillna('').to_dict(orient="records")
-    res = (x for x in rdf
-           if any(netutils.is_ip_in_addrs(ip_s, x.get(k, []))
-                  for k in addrs_cols))
+    (starts, ends, rows) = get_addr_ranges(tbl_df, addrs_cols)
+    hits = numpy.unique(rows[match_addr_ranges(numpy.uint32(ip_int),
+                                               starts, ends)])
 
-    return list(res)
+    return tbl_df.iloc[hits].fillna('').to_dict(orient="records")
+
+
+def make_addr_index(tbl_df, addrs_cols=ADDRS_COL_NAMES):
+    """
+    Make an index of ip address ranges in the table to search it by ip address
+    in O(log N) time. As ranges of networks do not overlap partially, ranges
+    contain an ip address are found by looking up the network address of it
+    for each size of ranges in the ranges sorted by (size, the first address).
+
+    :param tbl_df: See :func:`search_by_addr_1`
+    :param addrs_cols: See :func:`search_by_addr_1`
+
+    :return:
+        A tuple of :class:`numpy.ndarray` objects of (sorted keys, row
+        positions, sizes of ranges), where keys are (the index of the size of
+        the range << 32 | the first address)
+    """
+    (starts, ends, rows) = get_addr_ranges(tbl_df, addrs_cols)
+    starts = starts.astype(numpy.uint64)
+
+    (sizes, size_idxs) = numpy.unique(ends - starts + 1, return_inverse=True)
+    keys = (size_idxs.astype(numpy.uint64) << numpy.uint64(32)) | starts
+    order = numpy.argsort(keys, kind="stable")
+
+    return (keys[order], rows[order], sizes)
+
+
+def get_addr_index(tbl_df, addrs_cols=ADDRS_COL_NAMES):
+    """
+    Get the result of :func:`make_addr_index` cached while `tbl_df` is alive.
+
+    .. note:: The cache is not invalidated if `tbl_df` is modified in place.
+    """
+    key = (id(tbl_df), tuple(addrs_cols))
+    index = _ADDR_INDEXES.get(key)
+    if index is None:
+        index = _ADDR_INDEXES[key] = make_addr_index(tbl_df, addrs_cols)
+        weakref.finalize(tbl_df, _ADDR_INDEXES.pop, key, None)
+
+    return index
+
+
+def match_addr_index(ip_int, index):
+    """
+    :param ip_int: An int represents an IP address
+    :param index: An index made by :func:`make_addr_index`
+
+    :return:
+        A :class:`numpy.ndarray` of sorted unique row positions of which
+        ranges contain `ip_int`
+    """
+    (keys, rows, sizes) = index
+    ip_int = numpy.uint64(ip_int)
+
+    qkeys = ((numpy.arange(sizes.size, dtype=numpy.uint64) << numpy.uint64(32))
+             | (ip_int - ip_int % sizes))
+    los = numpy.searchsorted(keys, qkeys, side="left")
+    his = numpy.searchsorted(keys, qkeys, side="right")
+
+    return numpy.unique(numpy.concatenate(
+        [rows[lo:hi] for lo, hi in zip(los.tolist(), his.tolist()) if lo < hi]
+        or [rows[:0]]
+    ))
+
+
+def search_by_addr_indexed(ip_s, tbl_df, addrs_cols=ADDRS_COL_NAMES):
+    """
+    Same as :func:`search_by_addr_1` but search the table with the index made
+    by :func:`make_addr_index` and cached, which is faster if the table is
+    searched many times.
+
+    :param ip_s: A str represents an IP address
+    :param tbl_df: See :func:`search_by_addr_1`
+    :param addrs_cols: See :func:`search_by_addr_1`
+    """
+    if not utils.is_str(ip_s):
+        raise ValueError("Expected a str but: {!r}".format(ip_s))
+
+    ip_int = int(netutils.to_network(ip_s).network_address)
+    hits = match_addr_index(ip_int, get_addr_index(tbl_df, addrs_cols))
+
+    return tbl_df.iloc[hits].fillna('').to_dict(orient="records")
+
+
+def search_by_addrs(ip_ss, tbl_df, addrs_cols=ADDRS_COL_NAMES):
+    """
+    Search the table by ip addresses at once with the index made by
+    :func:`make_addr_index`. The rows found are converted to mapping objects
+    once and the same objects are shared among the results.
+
+    :param ip_ss: A list of str represent IP addresses
+    :param tbl_df: See :func:`search_by_addr_1`
+    :param addrs_cols: See :func:`search_by_addr_1`
+
+    :return:
+        A dict of {ip_s: [<mapping object>]}, the results same as
+        :func:`search_by_addr_1` returns for each ip address in `ip_ss`
+    """
+    ip_ss = list(ip_ss)
+    for ip_s in ip_ss:
+        if not utils.is_str(ip_s):
+            raise ValueError("Expected a str but: {!r}".format(ip_s))
+
+    index = get_addr_index(tbl_df, addrs_cols)
+    hits_by_ips = {
+        ip_s: match_addr_index(
+            int(netutils.to_network(ip_s).network_address), index
+        )
+        for ip_s in ip_ss
+    }
+
+    hits = numpy.unique(numpy.concatenate(list(hits_by_ips.values())
+                                          or [numpy.empty(0, numpy.intp)]))
+    recs = dict(zip(hits.tolist(),
+                    tbl_df.iloc[hits].fillna('').to_dict(orient="records")))
+
+    return {ip_s: [recs[pos] for pos in ip_hits.tolist()]
+            for ip_s, ip_hits in hits_by_ips.items()}
 
 # vim:sw=4:ts=4:et:
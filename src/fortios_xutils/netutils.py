@@ -12,7 +12,7 @@ import math
 import operator
 import re
 
-import netaddr
+import numpy
 
 from . import utils
 
@@ -21,10 +21,19 @@ IPV4_IP_RE_S = r"^(\d{1,3}\.){3}\d{1,3}"
 IPV4_IP_RE = re.compile(IPV4_IP_RE_S + r'(/\d{1,2})?$')
 UNI_NETMASK_RE = re.compile(r"^255.255.255.255$")
 
+# Comma separated IPv4 addresses in the canonical forms only, e.g.
+# '10.0.0.1,255.255.255.0', to convert them at once.
+_IPV4_OCTET_RE_S = r"(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)"
+_IPV4_IP_CANONICAL_RE_S = r"\.".join([_IPV4_OCTET_RE_S] * 4)
+_IPV4_IPS_CANONICAL_RE = re.compile(
+    "{0}(?:,{0})*".format(_IPV4_IP_CANONICAL_RE_S)
+)
+_IPV4_OCTET_SHIFTS = numpy.array([24, 16, 8, 0], dtype=numpy.int64)
+
 NET_MAX_PREFIX = 24
 
 
-@functools.lru_cache(maxsize=32)
+@functools.lru_cache(maxsize=4096)
 def normalize_ip(ip_s, prefix="/32"):
     """
     >>> normalize_ip("192.168.122.1")
@@ -43,7 +52,7 @@ def normalize_ip(ip_s, prefix="/32"):
     return ip_s
 
 
-@functools.lru_cache(maxsize=32)
+@functools.lru_cache(maxsize=4096)
 def is_network_address(addr, sep='/'):
     """
     :param addr: IP address string with prefix, e.g. 192.168.1.0/24
@@ -62,7 +71,7 @@ def is_network_address(addr, sep='/'):
     return ipaddress.ip_network(addr).num_addresses > 1
 
 
-@functools.lru_cache(maxsize=32)
+@functools.lru_cache(maxsize=4096)
 def subnet_to_ip(addr, netmask):
     """
     Convert fortios 'subnet' (addr, netmask) to ipaddress object.
@@ -76,7 +85,7 @@ def subnet_to_ip(addr, netmask):
         raise ValueError("Should be address but: "
                          "{!s}/{!s}".format(addr, netmask))
 
-    if UNI_NETMASK_RE.match(netmask):  # Unicast (host) address
+    if netmask == "255.255.255.255":  # Unicast (host) address
         return str(ipaddress.ip_interface(addr))
 
     try:
@@ -85,7 +94,53 @@ def subnet_to_ip(addr, netmask):
         return str(ipaddress.ip_interface(addr))  # Ignore the original netmask
 
 
-@functools.lru_cache(maxsize=32)
+def subnets_to_ips(subnets):
+    """
+    Convert fortios 'subnet's [(addr, netmask)] to ip addresses at once, same
+    as :func:`subnet_to_ip` does for each of them.
+
+    :param subnets: A list of fortios 'subnet', pairs of (addr, netmask)
+    :return:
+        A list of <ip_address_with_prefix :: str> or None for subnets which
+        should be converted by :func:`subnet_to_ip` one by one, e.g. invalid
+        ones or ones with netmasks look like host masks
+
+    >>> subnets_to_ips([("10.0.0.1", "255.255.255.255"),
+    ...                 ("192.168.1.0", "255.255.255.0"),
+    ...                 ("192.168.1.1", "255.255.255.0")])
+    ['10.0.0.1/32', '192.168.1.0/24', '192.168.1.1/32']
+    >>> subnets_to_ips([("10.0.0.1", "255.255.255.255"), ("10.0.0.1", )])
+    [None, None]
+    """
+    nones = [None] * len(subnets)
+    if not subnets or any(len(subnet) != 2 for subnet in subnets):
+        return nones
+
+    try:
+        addrs = ','.join(addr for subnet in subnets for addr in subnet)
+    except TypeError:  # Not a str.
+        return nones
+
+    if not _IPV4_IPS_CANONICAL_RE.fullmatch(addrs):
+        return nones
+
+    octs = numpy.fromstring(addrs.replace(',', '.'), dtype=numpy.int64,
+                            sep='.')
+    ints = (octs.reshape(len(subnets), 2, 4) << _IPV4_OCTET_SHIFTS).sum(-1)
+    (ips, hostmasks) = (ints[:, 0], ints[:, 1] ^ 0xffffffff)
+
+    # Netmasks must be contiguous, e.g. 255.255.255.0, and ip addresses of
+    # which host parts are not zero are host addresses.
+    is_netmasks = (hostmasks & (hostmasks + 1)) == 0
+    prefixes = 32 - numpy.log2(hostmasks + 1).astype(numpy.int64)
+    prefixes[(ips & hostmasks) != 0] = 32
+
+    return [subnet[0] + '/' + str(prefix) if is_netmask else None
+            for subnet, prefix, is_netmask
+            in zip(subnets, prefixes.tolist(), is_netmasks.tolist())]
+
+
+@functools.lru_cache(maxsize=4096)
 def iprange_to_ipsets(start_ip, end_ip, prefix=32):
     """
     Convert IP range {start_ip, end_ip} to IP sets [<ip_0>, ...]
@@ -104,15 +159,22 @@ def iprange_to_ipsets(start_ip, end_ip, prefix=32):
                          "{}/{}".format(start_ip, end_ip))
 
     # start_ip and end_ip should be in different networks.
-    if start_ip.split('.')[0] != end_ip.split('.')[0]:
+    if start_ip[:start_ip.index('.')] != end_ip[:end_ip.index('.')]:
         raise ValueError("Looks in different networks: "
                          "{}/{}".format(start_ip, end_ip))
 
-    return ["{!s}/{!s}".format(ip, prefix)
-            for ip in netaddr.iter_iprange(start_ip, end_ip)]
+    # Compute the ip addresses in the range as ints and format them at once,
+    # instead of constructing an address object for each of them.
+    (start, end) = (int(ipaddress.IPv4Address(start_ip)),
+                    int(ipaddress.IPv4Address(end_ip)))
+    fmt = "{}.{}.{}.{}/" + str(prefix)
+
+    return [fmt.format(ip >> 24, (ip >> 16) & 0xff, (ip >> 8) & 0xff,
+                       ip & 0xff)
+            for ip in range(start, end + 1)]
 
 
-@functools.lru_cache(maxsize=32)
+@functools.lru_cache(maxsize=4096)
 def to_network(addr_s):
     """
     :param addr_s:
@@ -162,6 +224,18 @@ def to_networks(*addrs):
     return [n for n in (to_network(a) for a in addrs) if n]
 
 
+@functools.lru_cache(maxsize=4096)
+def ip_str_to_int(ip_s):
+    """
+    :param ip_s: A str represents an IP address without prefix, e.g. 10.1.1.1
+    :return: An int represents the ip address `ip_s`
+
+    >>> ip_str_to_int("192.168.122.1")
+    3232266753
+    """
+    return int(ipaddress.ip_address(ip_s))
+
+
 def list_addrs_contain_the_ip_itr(ip_s, addrs):
     """
     :param ip_s: A str represents an (unicast, host) IP address, e.g. 10.1.1.1
@@ -188,6 +262,7 @@ def list_addrs_contain_the_ip_itr(ip_s, addrs):
         return
 
     ipa = normalize_ip(ip_s)  # Add prefix if it's not set.
+    ipa_int = ip_str_to_int(ipa.split('/')[0])
 
     for addr in addrs:
         if ipa == addr:  # Try exact match case first.
@@ -199,7 +274,9 @@ def list_addrs_contain_the_ip_itr(ip_s, addrs):
         if net is None:
             net = to_network(addr.split('/')[0])  # Strip prefix and ...
 
-        if ipaddress.ip_interface(ipa) in net:
+        (net_int, prefix, max_prefix) = _net_to_ints(net)
+        shift = max_prefix - prefix
+        if ipa_int >> shift == net_int >> shift:
             yield addr
 
 
@@ -228,25 +305,37 @@ def is_ip_in_addrs(ip_s, addrs):
     return any(list_addrs_contain_the_ip_itr(ip_s, addrs))
 
 
-def _is_subnet_of(net1, net2):
-    """An wrapper around ipaddress.IP*Network.subnet_of.
+@functools.lru_cache(maxsize=4096)
+def _net_to_ints(net):
+    """
+    :param net:
+        A str represents a network with prefix or an ipaddress.IPv*Network
+        object
+    :return: A tuple of (network_address, prefix, max_prefix) of `net` in ints
+
+    >>> _net_to_ints("192.168.122.0/24")
+    (3232266752, 24, 32)
+    >>> _net_to_ints(ipaddress.ip_network("10.0.0.1"))
+    (167772161, 32, 32)
+    """
+    net = ipaddress.ip_network(net)
+    return (int(net.network_address), net.prefixlen, net.max_prefixlen)
 
-    >>> net1 = ipaddress.ip_network("192.168.122.0/24")
-    >>> net2 = ipaddress.ip_network("192.168.0.0/16")
-    >>> net3 = ipaddress.ip_network("192.168.1.0/24")
-    >>> _is_subnet_of(net1, net1)
-    True
-    >>> _is_subnet_of(net1, net2)
-    True
-    >>> _is_subnet_of(net1, net3)
-    False
+
+def _common_prefix(net_ints):
     """
-    try:
-        return net1.subnet_of(net2)
-    except AttributeError:  # ipaddress in py36 does not have the above.
-        return (net1 == net2 or
-                (net2.network_address <= net1.network_address and
-                 net2.broadcast_address >= net1.broadcast_address))
+    :param net_ints: A list of tuples made by :func:`_net_to_ints`
+    :return: The prefix of the smallest network contains all of `net_ints`
+
+    >>> _common_prefix([_net_to_ints("192.168.122.0/24"),
+    ...                 _net_to_ints("192.168.1.0/24")])
+    17
+    """
+    (addr0, _prefix, max_prefix) = net_ints[0]
+    diff = functools.reduce(operator.or_, (a ^ addr0 for a, _, _ in net_ints))
+
+    return min(min(p for _, p, _ in net_ints),
+               max_prefix - diff.bit_length())
 
 
 def supernet_of_networks(*net_addrs, max_prefix=32):
@@ -273,20 +362,19 @@ def supernet_of_networks(*net_addrs, max_prefix=32):
     >>> supernet_of_networks(net1, net5)
     >>> supernet_of_networks(net1, net5, max_prefix=1)
     """
-    nets = sorted(to_networks(*net_addrs),
-                  key=operator.attrgetter("prefixlen"))
+    nets = to_networks(*net_addrs)
     if not nets:
         return None
 
-    max_prefix = min(nets[0].prefixlen, max_prefix)
+    net_ints = [_net_to_ints(n) for n in nets]
+    prefix = min(_common_prefix(net_ints), max_prefix)
+    if prefix < 1:
+        return None
 
-    # try to find the "smallest" (broadest) network.
-    for prefix in reversed(range(1, max_prefix + 1)):
-        cnet = nets[0].supernet(new_prefix=prefix)
-        if all(_is_subnet_of(n, cnet) for n in nets[1:]):
-            return cnet
+    (addr, _prefix, max_prefix) = net_ints[0]
+    shift = max_prefix - prefix
 
-    return None
+    return ipaddress.ip_network(((addr >> shift) << shift, prefix))
 
 
 def distance(net1, net2, base=1):
@@ -319,25 +407,25 @@ def distance(net1, net2, base=1):
     if net1 == net2:
         return 0
 
-    no1 = ipaddress.ip_network(net1)
-    no2 = ipaddress.ip_network(net2)
+    net_ints = [_net_to_ints(net1), _net_to_ints(net2)]
+    if net_ints[0][2] != net_ints[1][2]:  # IPv4 and IPv6 networks.
+        return math.inf
 
-    # Case that either net1 or net2 is a host address in other network.
-    if no1.num_addresses == 1 and ipaddress.ip_interface(net1) in no2:
-        return base
+    ((_a1, prefix1, max_prefix), (_a2, prefix2, _)) = net_ints
+    prefix = _common_prefix(net_ints)
 
-    if no2.num_addresses == 1 and ipaddress.ip_interface(net2) in no1:
+    # Case that either net1 or net2 is a host address in other network.
+    if max_prefix in (prefix1, prefix2) and prefix in (prefix1, prefix2):
         return base
 
     # Case that either net1 or net2 contains other network.
-    if _is_subnet_of(no1, no2) or _is_subnet_of(no2, no1):
-        return base * abs(no1.prefixlen - no2.prefixlen)
+    if prefix == min(prefix1, prefix2):
+        return base * abs(prefix1 - prefix2)
 
-    snet = supernet_of_networks(no1, no2)
-    if snet is None:
+    if prefix < 1:
         return math.inf
 
-    return base * (no1.prefixlen + no2.prefixlen - 2 * snet.prefixlen)
+    return base * (prefix1 + prefix2 - 2 * prefix)
 
 
 def find_nearest_network(ipa, nets):
@@ -360,6 +448,6 @@ def find_nearest_network(ipa, nets):
     >>> find_nearest_network(net3, [net1, net4])
     '192.168.122.0/24'
     """
-    return sorted(nets, key=functools.partial(distance, ipa))[0]
+    return min(nets, key=functools.partial(distance, ipa))
 
 # vim:sw=4:ts=4:et:
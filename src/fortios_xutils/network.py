@@ -7,13 +7,12 @@ r"""Collect network info from fortios' configuration.
 from __future__ import absolute_import
 
 import collections.abc
+import functools
 import ipaddress
 import itertools
 import logging
 import os.path
 
-import anyconfig
-
 from . import netutils, parser, utils
 
 
@@ -235,8 +234,27 @@ def collect_networks_from_config_files(filepaths, prefix=NET_MAX_PREFIX):
             for f in filepaths]
 
 
+def _collect_and_save_networks_from_config_file(io_paths,
+                                                prefix=NET_MAX_PREFIX):
+    """
+    Collect and save network information from a file, which takes a pair of
+    input and output paths to be called from worker processes.
+
+    :param io_paths: A pair of input and output file paths
+    :param prefix: 'Largest' network prefix to find
+
+    :return: A graph data contains metadata, nodes and links data
+    """
+    (fpath, outpath) = io_paths
+    data = collect_networks_from_config_file(fpath, prefix=prefix)
+    utils.save_file(data, outpath)
+
+    return data
+
+
 def collect_and_save_networks_from_config_files_itr(filepaths, outdir=False,
-                                                    prefix=NET_MAX_PREFIX):
+                                                    prefix=NET_MAX_PREFIX,
+                                                    max_workers=None):
     """
     Collect network infrmation from fortigate's parsed configuration file, and
     make a graph of netwrks of nodes and edges (node and network links).
@@ -246,18 +264,22 @@ def collect_and_save_networks_from_config_files_itr(filepaths, outdir=False,
         fortigate's 'show configuration' outputs
     :param outdir: Dir to save outputs [same dir input files exist]
     :param prefix: 'Largest' network prefix to find
+    :param max_workers:
+        Max number of processes to collect networks in parallel, see
+        :func:`fortios_xutils.utils.pmap_itr`
 
-    :return: A list of graph data contains metadata, nodes and links data
+    :yield: Graph data contains metadata, nodes and links data
     """
-    for fpath, outpath in utils.get_io_paths(filepaths, NET_FILENAME,
-                                             outdir=outdir):
-        data = collect_networks_from_config_file(fpath, prefix=prefix)
-        utils.save_file(data, outpath)
-        yield data
+    iopaths = utils.get_io_paths(filepaths, NET_FILENAME, outdir=outdir)
+    fnc = functools.partial(_collect_and_save_networks_from_config_file,
+                            prefix=prefix)
+
+    return utils.pmap_itr(fnc, iopaths, max_workers=max_workers)
 
 
 def collect_and_save_networks_from_config_files(filepaths, outdir=False,
-                                                prefix=NET_MAX_PREFIX):
+                                                prefix=NET_MAX_PREFIX,
+                                                max_workers=None):
     """
     Collect network infrmation from fortigate's parsed configuration file, and
     make a graph of netwrks of nodes and edges (node and network links).
@@ -267,14 +289,18 @@ def collect_and_save_networks_from_config_files(filepaths, outdir=False,
         fortigate's 'show configuration' outputs
     :param outdir: Dir to save outputs [same dir input files exist]
     :param prefix: 'Largest' network prefix to find
+    :param max_workers:
+        Max number of processes to collect networks in parallel; the value of
+        the environment variable FORTIOS_XUTILS_JOBS if it's set or the number
+        of CPUs by default, and files are processed serially if it's 1.
 
     :return: A list of graph data contains metadata, nodes and links data
     """
-    return list(
-        collect_and_save_networks_from_config_files_itr(
-            filepaths, outdir=outdir, prefix=prefix
-        )
-    )
+    iopaths = utils.get_io_paths(filepaths, NET_FILENAME, outdir=outdir)
+    fnc = functools.partial(_collect_and_save_networks_from_config_file,
+                            prefix=prefix)
+
+    return utils.pmap(fnc, iopaths, max_workers=max_workers, chunksize=2)
 
 
 def load_network_graph_files_itr(filepaths):
@@ -287,7 +313,7 @@ def load_network_graph_files_itr(filepaths):
     :return: A graph data contains metadata, nodes and links data
     """
     for filepath in filepaths:
-        graph = anyconfig.load(filepath)
+        graph = utils.load_file(filepath)
 
         if not isinstance(graph, collections.abc.Mapping) or \
                 "nodes" not in graph or "links" not in graph:
@@ -303,20 +329,6 @@ def load_network_graph_files_itr(filepaths):
             yield link
 
 
-def _compose_nodes_itr(graph):
-    """Compose nodes.
-    """
-    # select unique nodes
-    nodes = {n["id"]: n for n in graph
-             if n["type"] not in ("edge", "metadata")}.values()
-
-    for node in nodes:
-        node["class"] = "node {type}".format(**node)
-        node["label"] = "{id} {type}".format(**node)
-
-        yield node
-
-
 def compose_network_files(filepaths):
     """
     Compose a network graphs consist of nodes and edges (node and network
@@ -327,17 +339,27 @@ def compose_network_files(filepaths):
 
     :return: A graph data contains metadata, nodes and links data
     """
-    (nit, lit, mit) = itertools.tee(load_network_graph_files_itr(filepaths), 3)
-
-    nodes = list(_compose_nodes_itr(nit))
-    links = list({link["id"]: link for link in lit
-                  if link["type"] == "edge"}.values())
-
-    metadata = dict(sources=[m["source"] for m in mit
-                             if m["type"] == "metadata"],
-                    timestamp=utils.timestamp(), version=NET_DATA_FMT_VER)
-
-    return dict(metadata=metadata, nodes=nodes, links=links)
+    (nodes, links, sources) = (dict(), dict(), [])
+
+    # Select unique nodes and links by these IDs in a pass.
+    for obj in load_network_graph_files_itr(filepaths):
+        otype = obj["type"]
+        if otype == "metadata":
+            sources.append(obj["source"])
+        elif otype == "edge":
+            links[obj["id"]] = obj
+        else:
+            nodes[obj["id"]] = obj
+
+    for node in nodes.values():
+        node.update({"class": "node {type}".format(**node),
+                     "label": "{id} {type}".format(**node)})
+
+    metadata = dict(sources=sources, timestamp=utils.timestamp(),
+                    version=NET_DATA_FMT_VER)
+
+    return dict(metadata=metadata, nodes=list(nodes.values()),
+                links=list(links.values()))
 
 
 def compose_and_save_network_files(filepaths, outpath=False):
@@ -10,15 +10,20 @@ r"""Parse fortios' `show *configuration' outputs and generates various outputs.
 """
 from __future__ import absolute_import
 
+import collections
 import collections.abc
+import hashlib
 import logging
 import os.path
 import re
 
-import anyconfig
-
 from . import utils
 
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
 
 CNF_NAMES = ("system.*",
              "firewall service category",
@@ -30,6 +35,13 @@ CNF_NAMES = ("system.*",
 
 METADATA_FILENAME = "metadata.json"
 ALL_FILENAME = "all.json"
+CACHE_FILE_EXT = ".json"
+
+# JMESPath expressions select a config and query only in it, e.g.
+# "configs[?config=='system interface'].edits[].ip".
+_SINGLE_CONFIG_PATH_EXP_RE = re.compile(
+    r"^configs\[\?config==(['`])([^'`]+)\1\]([^|&<>=!]*)$"
+)
 
 LOG = logging.getLogger(__name__)
 
@@ -156,6 +168,54 @@ def config_edits_search(cname, data, normalize_fn=None, has_vdoms_=False,
                            has_vdoms_=has_vdoms_, vdom=vdom)
 
 
+def _add_config_edits(res, configs):
+    """
+    :param res: A mapping object of {config_name: [edit]} to add edits
+    :param configs: A list of configurations ({config: ..., edits: [...]})
+    """
+    for config in configs or []:
+        edits = config.get("edits")
+        if isinstance(edits, list):
+            res[config.get("config")].extend(edits)
+
+
+def extract_configs(cnf, has_vdoms_=False, vdom=None):
+    """
+    Group configurations (edits) in `cnf` by the names of them in one pass.
+    The edits of each configuration are same as :func:`config_edits_search`
+    returns for the name of it.
+
+    :param cnf: A mapping object contains configurations
+    :param has_vdoms_: True if givne `cnf` contains vdoms
+    :param vdom: Specify vdom to extract configurations
+
+    :return: A dict of {config_name: [<mapping object>]}
+    """
+    res = collections.defaultdict(list)
+    configs = cnf.get("configs") or []
+
+    if not has_vdoms_:
+        _add_config_edits(res, configs)
+        return dict(res)
+
+    gcnf = next((c for c in configs if c.get("config") == "global"), None)
+    if gcnf:
+        _add_config_edits(res, gcnf.get("configs"))
+
+    for config in configs:
+        if config.get("config") != "vdom":
+            continue
+
+        edits = config.get("edits") or []
+        if vdom and (not edits or edits[0].get("edit") != vdom):
+            continue
+
+        for edit in edits:
+            _add_config_edits(res, edit.get("configs"))
+
+    return dict(res)
+
+
 def validate(cnf, filepath=None):
     """
     Validate `cnf` to fail first.
@@ -178,20 +238,55 @@ def validate(cnf, filepath=None):
         raise ValueError("Configs :: [] was not found in {}".format(filepath))
 
 
-def parse_show_config(filepath):
+def cache_path(filepath, cache_dir):
+    """
+    :param filepath: Path to the file to parse
+    :param cache_dir: Dir to save parsed results as cache
+
+    :return:
+        Path to the cache file of which name is computed from the content of
+        `filepath` so that the cache is invalidated when the file was changed
+
+    .. note:: `filepath` is read once more to hash it, but it's much cheaper
+       than parsing it.
+    """
+    with open(filepath, "rb") as inp:
+        digest = hashlib.sha256(inp.read()).hexdigest()
+
+    return os.path.join(cache_dir, digest + CACHE_FILE_EXT)
+
+
+def parse_show_config(filepath, cache_dir=None):
     """
     Parse 'show full-configuration output and returns a list of parsed configs.
 
     :param filepath:
         a str or :class:`pathlib.Path` object represents file path contains
         'show full-configuration` or 'show' output
+    :param cache_dir:
+        Dir to save parsed results as cache and load them instead of parsing
+        the file again if its content was not changed
 
     :return: A mapping object holding configurations
     :raises: IOError, OSError and so on
     """
+    if cache_dir:
+        cpath = cache_path(filepath, cache_dir)
+        if os.path.exists(cpath):
+            LOG.debug("Load the cached result of %s: %s", filepath, cpath)
+            try:
+                return load(cpath)
+            except (ValueError, TypeError):  # e.g. Broken cache files.
+                LOG.warning("Ignored the invalid cache of %s: %s",
+                            filepath, cpath)
+
     cnf = utils.try_ac_load(filepath, type_="fortios")
     validate(cnf, filepath)
 
+    if cache_dir:
+        # The workers may write the cache of the same content at once.
+        utils.save_json(cnf, cpath, atomic=True)
+
     return cnf
 
 
@@ -206,12 +301,71 @@ def load(filepath):
     :return: A mapping object holding configurations
     :raises: IOError, OSError and so on
     """
-    cnf = utils.try_ac_load(filepath)
+    cnf = utils.try_json_load(filepath)
+    if cnf is None:  # Not UTF-8 encoded or not JSON data.
+        cnf = utils.try_ac_load(filepath)
+
     validate(cnf, filepath)
 
     return cnf
 
 
+def config_name_from_path_exp(path_exp):
+    """
+    :param path_exp: JMESPath expression to query configs
+    :return:
+        The name of the config if `path_exp` selects and queries only in it,
+        or None
+
+    >>> config_name_from_path_exp("configs[?config=='system interface']")
+    'system interface'
+    >>> config_name_from_path_exp("configs[?config==`firewall policy`]")
+    'firewall policy'
+    >>> config_name_from_path_exp("configs[?config=='a'] || configs") is None
+    True
+    >>> config_name_from_path_exp("configs[].config") is None
+    True
+    """
+    match = _SINGLE_CONFIG_PATH_EXP_RE.match(path_exp)
+    return match.group(2) if match else None
+
+
+def load_for_query(filepath, path_exp):
+    """
+    Similar to :func:`load` but load only the configs needed to query with
+    `path_exp` by parsing the file `filepath` in streaming manner to save
+    memory, if `path_exp` selects a config and queries only in it and ijson is
+    available.
+
+    :param filepath:
+        a str or :class:`pathlib.Path` object represents file path contains
+        parsed results of 'show full-configuration` or 'show' output
+    :param path_exp: JMESPath expression to query configs
+
+    :return: A mapping object holding (a part of) configurations
+    :raises: IOError, OSError and so on
+    """
+    cname = config_name_from_path_exp(path_exp)
+    if ijson is None or cname is None:
+        return load(filepath)
+
+    # Configs of 'global' and 'vdom' are needed to query configs with vdoms.
+    cnames = (cname, "global", "vdom")
+    try:
+        with open(filepath, "rb") as inp:
+            configs = [c for c in ijson.items(inp, "configs.item",
+                                              use_float=True)
+                       if isinstance(c, collections.abc.Mapping) and
+                       c.get("config") in cnames]
+    except (ValueError, ijson.JSONError):  # Not UTF-8 encoded JSON data.
+        return load(filepath)
+
+    if not configs:  # Let load() check it contains configs or not.
+        return load(filepath)
+
+    return dict(configs=configs)
+
+
 def hostname_from_configs(cnf, has_vdoms_=False):
     """
     Detect hostname of the fortigate node from its 'system global'
@@ -277,19 +431,22 @@ def list_cnames_for_regexp(cnf, regexp=None, has_vdoms_=False):
                       if regexp.match(c)))
 
 
-def parse_show_config_and_dump(inpath, outdir=None, cnames=CNF_NAMES):
+def parse_show_config_and_dump(inpath, outdir=None, cnames=CNF_NAMES,
+                               cache_dir=None):
     """
     :param inpath:
         a str or :class:`pathlib.Path` object represents file path contains
         'show full-configuration` or any other 'show ...' outputs
     :param outdir: Dir to save parsed results as JSON files
+    :param cache_dir:
+        Dir to cache parsed results, see :func:`parse_show_config`
 
     :return:
         ((all) output filepath, a mapping object contains parsed result)
 
     :raises: IOError, OSError
     """
-    cnf = parse_show_config(inpath)  # {"configs": [...]}
+    cnf = parse_show_config(inpath, cache_dir=cache_dir)  # {"configs": [...]}
 
     vdoms = list_vdom_names(cnf)
     _has_vdoms = vdoms and len(vdoms) > 1
@@ -312,7 +469,7 @@ def parse_show_config_and_dump(inpath, outdir=None, cnames=CNF_NAMES):
     houtdir = os.path.join(outdir, hostname)
 
     outpath = os.path.join(houtdir, ALL_FILENAME)
-    utils.save_file(cnf, outpath)
+    utils.save_json(cnf, outpath)
 
     gmark = '*'
     opts = dict(has_vdoms_=_has_vdoms)
@@ -327,27 +484,30 @@ def parse_show_config_and_dump(inpath, outdir=None, cnames=CNF_NAMES):
                     pexp = "configs[?config=='{}'].edits[]".format(ccn)
                     ccnf = jmespath_search(pexp, cnf, **opts)
                     ccname = cname_to_filename(ccn)
-                    anyconfig.dump(ccnf, os.path.join(houtdir, ccname))
+                    utils.save_json(ccnf, os.path.join(houtdir, ccname))
         else:
             # TODO: Save configs per global and VDoms?
             pexp = "configs[?config=='{}'].edits[]".format(cname)
             ccnf = jmespath_search(pexp, cnf, **opts)
             ccname = cname_to_filename(cname)
-            anyconfig.dump(ccnf, os.path.join(houtdir, ccname))
+            utils.save_json(ccnf, os.path.join(houtdir, ccname))
 
-    anyconfig.dump(dict(timestamp=utils.timestamp(), hostname=hostname,
-                        vdoms=vdoms, origina_data=inpath),
-                   os.path.join(houtdir, METADATA_FILENAME))
+    utils.save_json(dict(timestamp=utils.timestamp(), hostname=hostname,
+                         vdoms=vdoms, origina_data=inpath),
+                    os.path.join(houtdir, METADATA_FILENAME))
 
     return (outpath, cnf)
 
 
-def parse_show_configs_and_dump_itr(inpaths, outdir=None, cnames=CNF_NAMES):
+def parse_show_configs_and_dump_itr(inpaths, outdir=None, cnames=CNF_NAMES,
+                                    cache_dir=None):
     """
     :param inpaths:
         Similar to `inpath` in :func:`parse_show_config_and_dump` but consists
         of mulitple paths
     :param outdir: Dir to save parsed results as JSON files
+    :param cache_dir:
+        Dir to cache parsed results, see :func:`parse_show_config`
 
     :return:
         ((all) output filepath, a mapping object contains parsed result)
@@ -355,6 +515,7 @@ def parse_show_configs_and_dump_itr(inpaths, outdir=None, cnames=CNF_NAMES):
     :raises: IOError, OSError
     """
     for inpath in inpaths:
-        yield parse_show_config_and_dump(inpath, outdir, cnames=cnames)
+        yield parse_show_config_and_dump(inpath, outdir, cnames=cnames,
+                                         cache_dir=cache_dir)
 
 # vim:sw=4:ts=4:et:
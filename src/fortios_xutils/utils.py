@@ -6,18 +6,43 @@
 """
 from __future__ import absolute_import
 
+import collections
 import collections.abc
+import concurrent.futures
 import datetime
+import functools
 import glob
 import hashlib
+import itertools
+import json
+import mmap
 import os.path
 import os
+import tempfile
 
-import anyconfig
 import jmespath
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 _ENCODINGS = ("utf-8", "shift-jis")
+_JSON_EXTS = (".json", )
+_YAML_EXTS = (".yml", ".yaml")
+
+# Compression methods and the file extensions to infer them, which pandas
+# supports to save and load data (zstd requires zstandard).
+COMPRESSION_METHODS = dict(gzip="gz", bz2="bz2", xz="xz", zip="zip",
+                           zstd="zst")
+_GLOB_MAX_WORKERS = 8
+
+# Buffer size to write outputs.
+_WRITE_BUFSIZE = 256 * 1024
+
+# Environment variable to set the default max number of worker processes.
+JOBS_ENVVAR = "FORTIOS_XUTILS_JOBS"
 
 
 def ensure_dir_exists(filepath, subdir=None):
@@ -37,6 +62,40 @@ def ensure_dir_exists(filepath, subdir=None):
     return tdir
 
 
+def file_cache(maxsize=16):
+    """
+    Decorator to cache the results of a function loads data from a file, which
+    takes the file path as the first argument, like :func:`functools.lru_cache`
+    but the cache is invalidated when the file was changed.
+
+    :param maxsize: Max number of the cached results
+    """
+    def decorator(func):
+        """Decorator"""
+        cache = collections.OrderedDict()
+
+        @functools.wraps(func)
+        def wrapper(filepath, *args):
+            """Wrapper"""
+            stat = os.stat(filepath)
+            key = (os.path.realpath(filepath), stat.st_mtime_ns, stat.st_size,
+                   args)
+            if key in cache:
+                cache.move_to_end(key)
+                return cache[key]
+
+            res = cache[key] = func(filepath, *args)
+            if len(cache) > maxsize:
+                cache.popitem(last=False)
+
+            return res
+
+        wrapper.cache_clear = cache.clear
+        return wrapper
+
+    return decorator
+
+
 def is_str(obj):
     """
     >>> is_str(u"foo")
@@ -119,6 +178,27 @@ def get_io_paths(filepaths, filename, outdir=False):
         yield get_io_path(fpath, filename, outdir=outdir)
 
 
+def add_compression_ext(filename, compression=None):
+    """
+    :param filename: A str gives a file name or path
+    :param compression: Compression method, see COMPRESSION_METHODS
+
+    :return: `filename` with the file extension of `compression` if not added
+
+    >>> add_compression_ext("a.json", "gzip")
+    'a.json.gz'
+    >>> add_compression_ext("a.json.gz", "gzip")
+    'a.json.gz'
+    >>> add_compression_ext("a.json")
+    'a.json'
+    """
+    if not compression:
+        return filename
+
+    ext = '.' + COMPRESSION_METHODS[compression]
+    return filename if filename.endswith(ext) else filename + ext
+
+
 def try_ac_load(filepath, type_=None, encodings=_ENCODINGS):
     """
     Try to open and load `filepath` using anyconfig.load.
@@ -130,6 +210,8 @@ def try_ac_load(filepath, type_=None, encodings=_ENCODINGS):
     :return:
         A mapping object or sequence objects loaded from `filepath` or None
     """
+    import anyconfig  # pylint: disable=import-outside-toplevel
+
     for enc in encodings:
         try:
             with open(filepath, encoding=enc) as inp:
@@ -140,21 +222,166 @@ def try_ac_load(filepath, type_=None, encodings=_ENCODINGS):
     return None
 
 
+def try_json_load(filepath):
+    """
+    Try to load a JSON file `filepath` fast using orjson if it's available.
+
+    :param filepath: JSON file path to load
+    :return:
+        A mapping object or sequence objects loaded from `filepath` or None if
+        it's not a valid UTF-8 encoded JSON data
+    :raises: IOError, OSError
+    """
+    try:
+        with open(filepath, "rb") as inp:
+            if orjson is None:
+                return json.loads(inp.read())
+
+            if not os.fstat(inp.fileno()).st_size:  # It cannot be mapped.
+                return orjson.loads(b'')
+
+            # Decode the data mapped into memory instead of reading and
+            # copying it into a buffer.
+            with mmap.mmap(inp.fileno(), 0, access=mmap.ACCESS_READ) as mmp:
+                with memoryview(mmp) as view:
+                    return orjson.loads(view)
+    except ValueError:  # JSON decode errors, UnicodeDecodeError
+        return None
+
+
+def try_yaml_load(filepath):
+    """
+    Try to load a YAML file `filepath` fast using the LibYAML based loader if
+    it's available.
+
+    :param filepath: YAML file path to load
+    :return:
+        A mapping object or sequence objects loaded from `filepath` or None if
+        it's not a valid YAML data
+    :raises: IOError, OSError
+    """
+    import yaml  # pylint: disable=import-outside-toplevel
+
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    with open(filepath, "rb") as inp:
+        try:
+            return yaml.load(inp, Loader=loader)
+        except yaml.YAMLError:  # including errors of the encodings.
+            return None
+
+
+def load_file(filepath):
+    """
+    Load a JSON or YAML file `filepath` with the fast loaders, or
+    :func:`try_ac_load` if the file type is not known or these failed.
+
+    :param filepath: File path to load
+    :return:
+        A mapping object or sequence objects loaded from `filepath` or None
+    :raises: IOError, OSError
+    """
+    filepath = str(filepath)
+    data = None
+
+    if filepath.endswith(_JSON_EXTS):
+        data = try_json_load(filepath)
+    elif filepath.endswith(_YAML_EXTS):
+        data = try_yaml_load(filepath)
+
+    if data is None:
+        data = try_ac_load(filepath)
+
+    return data
+
+
+def dumps_json(data, indent=False):
+    """
+    Serialize `data` to JSON bytes, fast using orjson if it's available.
+
+    :param data: Data to serialize
+    :param indent: Indent the JSON string with two spaces if True
+
+    :return: A bytes object gives UTF-8 encoded JSON string
+
+    >>> dumps_json({"a": [1, 2]})
+    b'{"a":[1,2]}'
+    """
+    if orjson is None:
+        if indent:
+            return json.dumps(data, indent=2,
+                              ensure_ascii=False).encode("utf-8")
+
+        return json.dumps(data, ensure_ascii=False,
+                          separators=(',', ':')).encode("utf-8")
+
+    return orjson.dumps(data, option=(orjson.OPT_INDENT_2 if indent else 0))
+
+
+def save_json(data, filepath, atomic=False):
+    """
+    Save `data` as JSON, fast using orjson if it's available.
+
+    :param data: Data to save
+    :param filepath:  Path to output file
+    :param atomic:
+        Write `data` to a temporary file in the same dir and rename it to
+        `filepath` if True, so that others never see a partially written file
+    """
+    content = dumps_json(data)
+    ensure_dir_exists(filepath)
+
+    # Buffered writers write all of the data even if the underlying write(2)
+    # calls write only a part of it.
+    if atomic:
+        (fd, tmp) = tempfile.mkstemp(suffix=".tmp", prefix=".",
+                                     dir=os.path.dirname(filepath) or None)
+        try:
+            with os.fdopen(fd, "wb", buffering=_WRITE_BUFSIZE) as out:
+                out.write(content)
+            os.replace(tmp, filepath)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        return
+
+    with open(filepath, "wb", buffering=_WRITE_BUFSIZE) as out:
+        out.write(content)
+
+
 def save_file(data, filepath, **ac_opts):
     """
-    An wrapper for anyconfig.dump.
+    An wrapper for anyconfig.dump. JSON data is saved by :func:`save_json`
+    instead if no keyword arguments for anyconfig.dump were given.
 
     :param data: Data to save
     :param filepath:  Path to output file
     :param ac_opts: Keyword arguments will be given to anyconfig.dump
     """
+    if not ac_opts and str(filepath).endswith(".json"):
+        save_json(data, filepath)
+        return
+
     ensure_dir_exists(filepath)
+    import anyconfig  # pylint: disable=import-outside-toplevel
+
     anyconfig.dump(data, filepath, **ac_opts)
 
 
+@functools.lru_cache(maxsize=256)
+def compile_jmespath(jmespath_exp):
+    """
+    Compile JMESPath expression and cache the result to avoid parsing the same
+    expression again and again.
+
+    :param jmespath_exp: A str gives JMESPath expression
+    :return: A :class:`jmespath.parser.ParsedResult` object
+    """
+    return jmespath.compile(jmespath_exp)
+
+
 def search(jmespath_exp, data):
     """
-    Just an wrapper for :func:`jmespath.search`
+    An wrapper for :func:`jmespath.search` reuses compiled expressions.
 
     >>> search("[].a[]",
     ...        [dict(a=[1, 2], b=2), dict(b=3, c=4), dict(a=[3,4])])
@@ -162,18 +389,245 @@ def search(jmespath_exp, data):
     >>> search("[].x", [dict(a=[1, 2], b=2)])
     []
     """
-    return jmespath.search(jmespath_exp, data)
+    return compile_jmespath(jmespath_exp).search(data)
+
+
+def _split_recursive_glob(pattern):
+    """
+    :param pattern: A str gives a glob pattern
+    :return:
+        A tuple of (base dir, the rest of the pattern) if `pattern` looks like
+        '<base dir>/**/<rest>' and the base dir does not contain any glob
+        patterns, or None
+    """
+    sep = os.path.sep
+    (base, marker, rest) = pattern.partition(sep + "**" + sep)
+    if not marker or not rest or any(c in base for c in "*?["):
+        return None
+
+    return (base or sep, rest)
 
 
-def expand_glob_paths_itr(filepaths, marker='*'):
+def iglob_in_parallel(pattern, max_workers=_GLOB_MAX_WORKERS):
     """
-    :param filepaths: A list of file paths
+    Similar to glob.iglob(pattern, recursive=True) but walk the sub dirs of
+    the base dir in parallel using threads if `pattern` looks like
+    '<base dir>/**/<rest>', as it's bound to the latency of stat'ing dirs.
+
+    :param pattern: A str gives a glob pattern
+    :param max_workers: Max number of threads to walk dirs
+
+    :yield: A str gives a path matched with `pattern` in arbitrary order
+    """
+    base_rest = _split_recursive_glob(pattern)
+    subdirs = []
+    if base_rest:
+        try:
+            with os.scandir(base_rest[0]) as entries:
+                subdirs = [e.path for e in entries
+                           if e.is_dir() and not e.name.startswith('.')]
+        except OSError:
+            pass
+
+    if len(subdirs) < 2:
+        yield from glob.iglob(pattern, recursive=True)
+        return
+
+    (base, rest) = base_rest
+    patterns = [os.path.join(base, rest)]  # '**' matches zero dirs.
+    patterns.extend(os.path.join(sdir, "**", rest) for sdir in subdirs)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        futs = [executor.submit(glob.glob, pat, recursive=True)
+                for pat in patterns]
+        for fut in concurrent.futures.as_completed(futs):
+            yield from fut.result()
+
+
+def expand_glob_paths_itr(filepaths, marker='*', sort=True):
+    """
+    :param filepaths:
+        A list of str or :class:`pathlib.Path` objects gives file paths or
+        glob patterns. '**' in patterns matches any files and zero or more
+        dirs.
+    :param marker: A str to find glob patterns
+    :param sort:
+        Sort the paths matched with each glob pattern if True, or yield them
+        lazily in arbitrary order as found
+
+    :yield: A str gives a file path
     """
     for fpath in filepaths:
+        fpath = str(fpath)
+
         if marker in fpath:
-            for path in sorted(glob.glob(fpath)):
-                yield path
+            if sort:
+                yield from sorted(iglob_in_parallel(fpath))
+            else:
+                yield from iglob_in_parallel(fpath)
         else:
             yield fpath
 
+
+def resolve_filepaths(filepaths, marker='*'):
+    """
+    Similar to :func:`expand_glob_paths_itr` but return a tuple of the file
+    paths.
+
+    :param filepaths:
+        A list of str or :class:`pathlib.Path` objects gives file paths or
+        glob patterns
+    :param marker: A str to find glob patterns
+
+    :return: A tuple of str gives file paths
+    """
+    return tuple(expand_glob_paths_itr(filepaths, marker=marker))
+
+
+def tmap_itr(func, items, max_workers=None):
+    """
+    Map `func` over `items` using threads and yield the results in the same
+    order as `items`. It's suitable for I/O bound tasks.
+
+    `items` are consumed lazily and up to twice the number of threads are
+    processed ahead of the caller, so that the results are not kept in memory
+    more than that even if the caller consumes them slowly.
+
+    :param func: A callable
+    :param items: An iterable object yields arguments given to `func`
+    :param max_workers:
+        Max number of threads; see the default of
+        :class:`concurrent.futures.ThreadPoolExecutor`. The results are
+        computed serially in this thread if it's 1.
+
+    :yield: The results
+
+    >>> list(tmap_itr(abs, [-1, 2, -3], max_workers=1))
+    [1, 2, 3]
+    """
+    if max_workers == 1:
+        yield from map(func, items)
+        return
+
+    if max_workers is None:  # Same as the default of ThreadPoolExecutor.
+        max_workers = min(32, (os.cpu_count() or 1) + 4)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        yield from _submit_itr(executor, func, items, max_workers * 2)
+
+
+def _submit_itr(executor, func, items, nahead):
+    """
+    Submit `func` with each of `items` to `executor` lazily and yield the
+    results in the same order as `items`, keeping at most `nahead` futures.
+
+    :param executor: A :class:`concurrent.futures.Executor` object
+    :param func: A callable
+    :param items: An iterable object yields arguments given to `func`
+    :param nahead: Max number of the items processed ahead of the caller
+
+    :yield: The results
+    """
+    futs = collections.deque()
+    try:
+        for item in items:
+            futs.append(executor.submit(func, item))
+            if len(futs) >= nahead:
+                yield futs.popleft().result()
+
+        while futs:
+            yield futs.popleft().result()
+    finally:  # Do not run the rest if the caller stopped iteration.
+        for fut in futs:
+            fut.cancel()
+
+
+def get_max_workers(max_workers=None):
+    """
+    :param max_workers: Max number of worker processes or None
+    :return:
+        `max_workers` if it's given, or the value of the environment variable
+        FORTIOS_XUTILS_JOBS as an int if it's set, or None
+
+    :raises: ValueError if the value of the environment variable is invalid
+
+    >>> get_max_workers(2)
+    2
+    """
+    if max_workers is not None:
+        return max_workers
+
+    jobs = os.environ.get(JOBS_ENVVAR)
+    if not jobs:
+        return None
+
+    try:
+        max_workers = int(jobs)
+    except ValueError:
+        max_workers = 0
+
+    if max_workers < 1:
+        raise ValueError("Invalid value of {}: {!r}".format(JOBS_ENVVAR, jobs))
+
+    return max_workers
+
+
+def pmap(func, items, max_workers=None, chunksize=1):
+    """
+    Map `func` over `items` using processes and return a list of the results
+    in the same order as `items`.
+
+    :param func: A callable which must be picklable, e.g. a top-level function
+    :param items: An iterable object yields arguments given to `func`
+    :param max_workers:
+        Max number of worker processes; the value of the environment variable
+        FORTIOS_XUTILS_JOBS if it's set or the number of CPUs by default. The
+        results are computed serially in this process if it's 1.
+    :param chunksize: Size of the chunks of `items` sent to the workers
+
+    :return: A list of the results
+
+    >>> pmap(abs, [-1, 2, -3], max_workers=1)
+    [1, 2, 3]
+    """
+    items = list(items)
+    max_workers = get_max_workers(max_workers)
+    if max_workers == 1 or len(items) < 2:
+        return [func(item) for item in items]
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers) as executor:
+        return list(executor.map(func, items, chunksize=chunksize))
+
+
+def pmap_itr(func, items, max_workers=None):
+    """
+    Similar to :func:`pmap` but consume `items` lazily and yield the results
+    in the same order as `items` as they are ready. Up to twice the number of
+    processes are processed ahead of the caller, so that the results are not
+    kept in memory more than that.
+
+    :param func: A callable which must be picklable, e.g. a top-level function
+    :param items: An iterable object yields arguments given to `func`
+    :param max_workers: See :func:`pmap`
+
+    :yield: The results
+
+    >>> list(pmap_itr(abs, [-1, 2, -3], max_workers=1))
+    [1, 2, 3]
+    """
+    items = iter(items)
+    head = list(itertools.islice(items, 2))
+    items = itertools.chain(head, items)
+
+    max_workers = get_max_workers(max_workers)
+    if max_workers == 1 or len(head) < 2:
+        yield from map(func, items)
+        return
+
+    if max_workers is None:  # Same as the default of ProcessPoolExecutor.
+        max_workers = os.cpu_count() or 1
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers) as executor:
+        yield from _submit_itr(executor, func, items, max_workers * 2)
+
 # vim:sw=4:ts=4:et:
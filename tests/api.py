@@ -62,6 +62,55 @@ class TestCase(C.TestCaseWithWorkdir):
             files = glob.glob(os.path.join(outdir, '*', fname))
             self.assertTrue(files)
 
+    def test_18_query_json_files_itr(self):
+        tfn = self._fun("query_json_files_itr")
+
+        query = "configs[?config=='system interface'].edits[].ip"
+        res = list(tfn(self.cpaths, query))
+        self.assertEqual(len(res), len(self.cpaths))
+
+        for (fpath, qres), cpath in zip(res, self.cpaths):
+            self.assertEqual(fpath, cpath)
+            self.assertTrue(qres)
+
+        itr = tfn(["/not/exist/file.json"], "configs[?")
+        self.assertRaises(ValueError, next, itr)  # Not IOError.
+
+        self.assertEqual(list(tfn(self.cpaths, query, max_workers=1)), res)
+
+        for cpath in self.cpaths:  # Each batch is made of the same kind.
+            self.assertEqual(list(tfn([cpath] * 2, query, strict_vdom=False)),
+                             list(tfn([cpath] * 2, query)))
+
+    def test_14_parse_and_save_show_configs__serial(self):
+        tfn = self._fun("parse_and_save_show_configs")
+
+        outdir = os.path.join(self.workdir, "out")
+        res = tfn(self.sources, outdir, max_workers=1)
+        self.assertEqual(len(res), len(self.sources))
+
+        for opath, cnf in res:
+            self.assertTrue(os.path.exists(opath))
+            self.assertTrue(cnf)
+
+    def test_16_parse_and_save_show_configs__paths_only(self):
+        tfn = self._fun("parse_and_save_show_configs")
+
+        outdir = os.path.join(self.workdir, "out")
+        ref = tfn(self.sources, outdir, max_workers=1)
+        for max_workers in (1, 2):
+            res = tfn(self.sources, outdir, max_workers=max_workers,
+                      paths_only=True)
+            self.assertEqual(res, [opath for opath, _cnf in ref])
+
+    def test_19_query_json_file(self):
+        tfn = self._fun("query_json_file")
+
+        query = "configs[?config=='system interface'].edits[].ip"
+        ref = self._fun("query_json_files")(self.cpaths, query)
+        for cpath, rres in zip(self.cpaths, ref):
+            self.assertEqual(tfn(cpath, query), rres["results"])
+
     def test_20_query_json_files__single_input(self):
         tfn = self._fun("query_json_files")
 
@@ -113,6 +162,16 @@ class TestCase(C.TestCaseWithWorkdir):
         self.assertTrue(files)
         self.assertEqual(len(files), 2)
 
+    def test_44_collect_and_save_networks_itr(self):
+        tfn = self._fun("collect_and_save_networks_itr")
+
+        outdir = os.path.join(self.workdir, "out")
+        res = list(tfn(self.cpaths, outdir=outdir))
+        self.assertEqual(len(res), len(self.cpaths))
+
+        files = glob.glob(os.path.join(outdir, '*', N.NET_FILENAME))
+        self.assertEqual(len(files), 2)
+
     def test_50_compose_networks__single_input(self):
         tfn = self._fun("compose_networks")
 
@@ -199,6 +258,13 @@ class TestCase(C.TestCaseWithWorkdir):
             res = tfn3(ipa, rdf)
             self.assertTrue(res)
 
+        tfn4 = self._fun("search_firewall_policy_table_by_addrs")
+        for fpath in files:
+            rdf = tfn2(fpath)
+            res = tfn4(["127.0.0.1", ipa], rdf)
+            self.assertFalse(res["127.0.0.1"])
+            self.assertEqual(res[ipa], tfn3(ipa, rdf))
+
     def test_80_find_network_paths__not_found(self):
         tfn = self._fun("find_network_paths")
 
@@ -215,4 +281,27 @@ class TestCase(C.TestCaseWithWorkdir):
             res = tfn(npath, src, dst)
             self.assertTrue(res)
 
+    def test_84_load_network_graph__copies(self):
+        tfn = self._fun("load_network_graph")
+
+        for npath in self.npaths:
+            graph = tfn(npath)
+            nnodes = len(graph)
+            graph.remove_node(next(iter(graph.nodes)))
+
+            self.assertEqual(len(tfn(npath)), nnodes)
+            self.assertTrue(self._fun("find_network_paths")(
+                npath, "192.168.122.2", "192.168.5.10"
+            ))
+
+    def test_86_load_firewall_policy_table__copies(self):
+        tfn = self._fun("load_firewall_policy_table")
+
+        for fpath in self.fpaths:
+            rdf = tfn(fpath)
+            nrows = len(rdf)
+            rdf.drop(rdf.index[:1], inplace=True)
+
+            self.assertEqual(len(tfn(fpath)), nrows)
+
 # vim:sw=4:ts=4:et:
@@ -6,7 +6,10 @@
 from __future__ import absolute_import
 
 import glob
+import json
 import os.path
+import subprocess
+import sys
 
 import click.testing
 
@@ -14,6 +17,7 @@ import fortios_xutils.cli as TT
 import fortios_xutils.firewall as F
 import fortios_xutils.network as N
 import fortios_xutils.parser as P
+import fortios_xutils.utils
 import tests.common as C
 
 
@@ -50,6 +54,26 @@ class TestCliCases(Base):
     def setUp(self):
         self.runner = click.testing.CliRunner()
 
+    def test_02_print_json_list(self):
+        for items in ([], [1], [dict(a=[1, 2], b="c"), [], dict(d={})]):
+            for indent in (True, False, None):
+                with self.runner.isolation() as outs:
+                    TT.print_json(items, indent=indent)
+                    ref = outs[0].getvalue()
+
+                with self.runner.isolation() as outs:
+                    TT.print_json_list(iter(items), indent=indent)
+                    self.assertEqual(outs[0].getvalue(), ref)
+
+                self.assertEqual(json.loads(ref), items)
+                self.assertEqual(b"\n  " in ref, bool(indent and items))
+
+    def test_00_import_lazily(self):
+        code = ("import sys, fortios_xutils.cli; "
+                "assert not [m for m in ('anyconfig', 'networkx', 'pandas') "
+                "            if m in sys.modules]")
+        subprocess.check_call([sys.executable, "-c", code])
+
     def test_10_parse__single_input(self):
         outdir = "out"
         for src in self.sources:
@@ -73,6 +97,17 @@ class TestCliCases(Base):
                 files = glob.glob(os.path.join(outdir, '*', fname))
                 self.assertTrue(files)
 
+    def test_14_parse__multi_inputs__serial(self):
+        outdir = "out"
+        with self.runner.isolated_filesystem():
+            res = self.runner.invoke(TT.parse,
+                                     ["-O", outdir, "-j", "1"] + self.sources)
+            self.assertEqual(res.exit_code, 0)
+            self.assertFalse(res.output)
+
+            files = glob.glob(os.path.join(outdir, '*', P.ALL_FILENAME))
+            self.assertEqual(len(files), len(self.sources))
+
     def test_20_search__single_input(self):
         query = "configs[?config=='system interface'].edits[].ip"
         for cpath in self.cpaths:
@@ -86,6 +121,23 @@ class TestCliCases(Base):
         self.assertEqual(res.exit_code, 0)
         self.assertTrue(res.output)
 
+    def test_24_search__glob_pattern(self):
+        query = "configs[?config=='system interface'].edits[].ip"
+        topdir = os.path.dirname(os.path.dirname(self.cpaths[0]))
+        pattern = os.path.join(topdir, '*', P.ALL_FILENAME)
+        res = self.runner.invoke(TT.search, ["-P", query, pattern])
+        self.assertEqual(res.exit_code, 0)
+
+        ref = self.runner.invoke(TT.search, ["-P", query] + self.cpaths)
+        self.assertEqual(res.output, ref.output)
+
+        res = self.runner.invoke(TT.search, ["-P", query, "/not/exist.json"])
+        self.assertEqual(res.exit_code, 2)
+        self.assertTrue("does not exist" in res.output, res.output)
+
+        res = self.runner.invoke(TT.search, ["-P", query, "/not/*.json"])
+        self.assertEqual(res.exit_code, 0)
+
     def test_30_network_collect__single_input(self):
         outdir = "out"
         for cpath in self.cpaths:
@@ -111,6 +163,17 @@ class TestCliCases(Base):
             self.assertTrue(files)
             self.assertEqual(len(files), 2)
 
+    def test_34_network_collect__multi_inputs__serial(self):
+        outdir = "out"
+        with self.runner.isolated_filesystem():
+            res = self.runner.invoke(TT.network_collect,
+                                     ["-O", outdir, "-j", "1"] + self.cpaths)
+            self.assertEqual(res.exit_code, 0)
+            self.assertFalse(res.output)
+
+            files = glob.glob(os.path.join(outdir, '*', N.NET_FILENAME))
+            self.assertEqual(len(files), 2)
+
     def test_40_network_compose__single_input(self):
         opath = os.path.join("out", N.NET_ALL_FILENAME)
         for cpath in self.cpaths:
@@ -164,7 +227,7 @@ class TestCliCases(Base):
         outdir = "out"
         with self.runner.isolated_filesystem():
             res = self.runner.invoke(TT.firewall_policy_save,
-                                     ["-O", outdir] + self.cpaths)
+                                     ["-O", outdir, "-j", "2"] + self.cpaths)
             self.assertEqual(res.exit_code, 0)
             self.assertFalse(res.output)
 
@@ -191,6 +254,29 @@ class TestCliCases(Base):
                 self.assertTrue(res.output)
                 self.assertNotEqual(res.output, "[]\n")
 
+    def test_56_firewall_policy_save__compression(self):
+        outdir = "out"
+        ipa = "192.168.122.3"
+        for method in ("gzip", "xz"):
+            with self.runner.isolated_filesystem():
+                res = self.runner.invoke(
+                    TT.firewall_policy_save,
+                    ["-O", outdir, "-c", method, "-j", "1"] + self.cpaths
+                )
+                self.assertEqual(res.exit_code, 0)
+
+                ext = fortios_xutils.utils.COMPRESSION_METHODS[method]
+                files = glob.glob(os.path.join(outdir, '*',
+                                               F.FWP_TABLE_FILENAME + '.' +
+                                               ext))
+                self.assertEqual(len(files), 2)
+
+                for fdb in files:
+                    res = self.runner.invoke(TT.firewall_policy_search,
+                                             ["-i", ipa, fdb])
+                    self.assertEqual(res.exit_code, 0)
+                    self.assertNotEqual(res.output, "[]\n")
+
     def test_70_network_find_paths__not_found(self):
         (src, dst) = ("127.0.0.1", "192.168.122.2")
         for npath in self.npaths:
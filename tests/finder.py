@@ -6,6 +6,7 @@
 from __future__ import absolute_import
 
 import functools
+import pickle
 
 import fortios_xutils.finder as TT
 import tests.common as C
@@ -27,6 +28,27 @@ class TestCases_10(C.unittest.TestCase):
     def test_20_load(self):
         self.assertTrue(TT.load(NET_CONF_PATH))
 
+    def test_22_find_nodes_by_ip_in_index(self):
+        graph = TT.load(NET_CONF_PATH)
+        index = TT.get_net_index(graph)
+        self.assertTrue(TT.get_net_index(graph) is index)
+        self.assertTrue(pickle.loads(pickle.dumps(graph)))
+        self.assertFalse(graph.graph)
+
+        for ipa in ("192.168.122.10", "192.168.122.2", "192.168.5.10",
+                    "127.0.0.1", "0.0.0.0", "192.168.1.0/24"):
+            ref = list(TT.find_nodes_by_ip_itr(TT.graph_nodes_itr(graph),
+                                               ipa))
+            res = TT.find_nodes_by_ip_in_index(index, ipa)
+            self.assertEqual(res, ref, ipa)
+
+    def test_24_make_net_index__invalid_addrs(self):
+        graph = TT.networkx.Graph()
+        graph.add_nodes_from([("a", dict(id="a", addrs=["192.168.1.0/24"])),
+                              ("b", dict(id="b", addrs=["b", 1]))])
+        index = TT.make_net_index(graph)
+        self.assertEqual(index, {24: {3232235776: [(0, graph.nodes["a"])]}})
+
     def test_30_find_paths(self):
         fnc = functools.partial(TT.find_paths, NET_CONF_PATH)
 
@@ -36,4 +58,51 @@ class TestCases_10(C.unittest.TestCase):
         self.assertTrue(n.get("id", '') == "192.168.122.0/24" for n in pss)
         self.assertTrue(n.get("id", '') == "192.168.5.0/24" for n in pss)
 
+        for nodes in pss:
+            self.assertEqual(nodes[0]["id"], "192.168.122.0/24")
+            self.assertEqual(nodes[-1]["id"], "192.168.5.0/24")
+
+    def test_32_find_paths__node_type(self):
+        fnc = functools.partial(TT.find_paths, NET_CONF_PATH,
+                                "192.168.122.2", "192.168.5.10")
+        ref = fnc()
+
+        self.assertEqual(fnc(node_type=TT.NODE_ANY), ref)
+
+        pss = fnc(node_type="firewall")
+        self.assertTrue(pss)
+        self.assertTrue(all(n["type"] == "firewall" for ps in pss for n in ps))
+        self.assertEqual(len(pss), len(set(tuple(n["id"] for n in ps)
+                                           for ps in pss)))
+
+        pss = fnc(node_type="network")
+        self.assertTrue(pss)
+        self.assertTrue(all(n["type"] == "network" for ps in pss for n in ps))
+
+        pss = TT.find_paths(NET_CONF_PATH, "192.168.122.2", "192.168.122.3",
+                            node_type=TT.NODE_ANY)
+        self.assertTrue(pss)
+
+    def test_34_find_paths__order(self):
+        fnc = functools.partial(TT.find_paths, NET_CONF_PATH,
+                                "192.168.122.2", "192.168.5.10")
+        graph = TT.load(NET_CONF_PATH)
+
+        # Nodes are in the order of the path from the source to destination.
+        pss = fnc()
+        for nodes in pss:
+            self.assertTrue(all(graph.has_edge(n1["id"], n2["id"])
+                                for n1, n2 in zip(nodes, nodes[1:])))
+
+        # Filtered paths keep the order and are unique in that order.
+        nids_list = [[n["id"] for n in ns if n["type"] == "network"]
+                     for ns in pss]
+        ref = []
+        for nids in nids_list:
+            if nids not in ref:
+                ref.append(nids)
+
+        res = [[n["id"] for n in ns] for ns in fnc(node_type="network")]
+        self.assertEqual(res, ref)
+
 # vim:sw=4:ts=4:et:
@@ -5,7 +5,12 @@
 # pylint: disable=missing-docstring,invalid-name
 from __future__ import absolute_import
 
+import copy
+import ipaddress
 import os.path
+import unittest.mock
+
+import pytest
 
 import fortios_xutils.firewall as TT
 import fortios_xutils.parser as P
@@ -23,6 +28,28 @@ class TestCases_10(C.TestCase):
         self.assertFalse(rdf.empty)
         self.assertEqual(rdf.to_dict(orient="records"), [dict(a=1)])
 
+    def test_14_normalize_fas(self):
+        fas = [dict(edit="0", subnet=["10.0.0.1", "255.255.255.255"]),
+               dict(edit="1", subnet=["10.0.0.0", "255.0.0.0"]),
+               dict(edit="2", subnet=["10.0.0.0", "0.0.0.255"]),
+               dict(edit="3", fqdn="www.example.com"),
+               dict(edit="4", type="iprange", **{"start-ip": "10.0.0.1",
+                                                 "end-ip": "10.0.0.2"})]
+
+        ref = [TT.normalize_fa(copy.deepcopy(fa)) for fa in fas]
+        self.assertEqual(TT.normalize_fas(fas), ref)
+
+    def test_20_match_addr_ranges(self):
+        starts = TT.numpy.array([0, 10, 20, 15], dtype=TT.numpy.uint32)
+        ends = TT.numpy.array([5, 19, 20, 30], dtype=TT.numpy.uint32)
+
+        for ip_int, ref in ((0, [True, False, False, False]),
+                            (6, [False, False, False, False]),
+                            (15, [False, True, False, True]),
+                            (20, [False, False, True, True])):
+            res = TT.match_addr_ranges(TT.numpy.uint32(ip_int), starts, ends)
+            self.assertEqual(list(res), ref)
+
     def test_30_guess_file_type(self):
         self.assertEqual(TT.guess_file_type("foo.pickle"), "pickle")
         self.assertEqual(TT.guess_file_type("foo.json"), "json")
@@ -41,6 +68,89 @@ class TestCases_20(C.TestCaseWithWorkdir):
             TT.pandas_save(TT.DF_ZERO, filepath + ".gz")
             self.assertTrue(TT.os.path.exists(filepath + ".gz"))
 
+        rdf = TT.pandas.DataFrame(dict(a=list(range(100))))
+        filepath = TT.os.path.join(self.workdir, "2", "test.json.gz")
+        TT.pandas_save(rdf, filepath)
+        with open(filepath, "rb") as fobj:
+            self.assertEqual(fobj.read(9)[-1], 4)  # XFL: the fastest level
+        self.assertTrue(TT.pandas_load(filepath).equals(rdf))
+
+    def test_11_pandas_save_load__parquet(self):
+        filepath = TT.os.path.join(self.workdir, "test.parquet")
+        with unittest.mock.patch.object(TT.pandas.DataFrame,
+                                        "to_parquet") as save_fn:
+            TT.pandas_save(TT.DF_ZERO, filepath)
+            save_fn.assert_called_once_with(filepath, compression="zstd")
+
+        for has_pyarrow, opts in ((True, TT.PANDAS_LOAD_OPTS["parquet"]),
+                                  (False, {})):
+            with unittest.mock.patch.object(
+                    TT.pandas, "read_parquet", return_value=TT.DF_ZERO
+            ) as load_fn, unittest.mock.patch.object(
+                    TT, "_has_pyarrow", return_value=has_pyarrow
+            ):
+                TT.pandas_load(filepath)
+                load_fn.assert_called_once_with(filepath, **opts)
+
+    def test_13_pandas_save__parquet(self):
+        pyarrow = pytest.importorskip("pyarrow")
+        pyarrow_parquet = pytest.importorskip("pyarrow.parquet")
+
+        for idx, cpath in enumerate(TestCasesWithConfigs.cpaths):
+            rdf = TT.make_firewall_policy_table(cpath)
+            filepath = TT.os.path.join(self.workdir, str(idx), "t.parquet")
+            TT.pandas_save(rdf, filepath)
+
+            tbl = pyarrow_parquet.read_table(filepath)
+            self.assertEqual(tbl.num_rows, len(rdf))
+            for col in ("srcaddr", "dstaddr", "srcaddrs", "dstaddrs"):
+                self.assertEqual(tbl.schema.field(col).type,
+                                 pyarrow.list_(pyarrow.string()), col)
+
+    def test_14_pandas_save_load__parquet(self):
+        pytest.importorskip("pyarrow")
+
+        for idx, cpath in enumerate(TestCasesWithConfigs.cpaths):
+            rdf = TT.make_firewall_policy_table(cpath)
+            filepath = TT.os.path.join(self.workdir, str(idx), "t.parquet")
+            TT.pandas_save(rdf, filepath)
+
+            res = TT.pandas_load(filepath)
+            ref = TT._make_list_columns_uniform(rdf)
+            self.assertEqual(res.fillna('').to_dict(orient="records"),
+                             ref.fillna('').to_dict(orient="records"))
+
+            for ip_s in ("192.168.122.1", "192.168.3.5"):
+                hits = TT.search_by_addr_1(ip_s, res)
+                self.assertEqual(
+                    TT.utils.json.loads(TT.utils.dumps_json(hits)), hits
+                )
+
+    def test_16_pandas_save_load__feather(self):
+        pyarrow = pytest.importorskip("pyarrow")
+        pyarrow_feather = pytest.importorskip("pyarrow.feather")
+
+        for idx, cpath in enumerate(TestCasesWithConfigs.cpaths):
+            rdf = TT.make_firewall_policy_table(cpath)
+            filepath = TT.os.path.join(self.workdir, str(idx), "t.feather")
+            TT.pandas_save(rdf, filepath)
+
+            tbl = pyarrow_feather.read_table(filepath)
+            self.assertEqual(tbl.num_rows, len(rdf))
+            for col in ("srcaddr", "dstaddr", "srcaddrs", "dstaddrs"):
+                self.assertEqual(tbl.schema.field(col).type,
+                                 pyarrow.list_(pyarrow.string()), col)
+
+            res = TT.pandas_load(filepath)
+            ref = TT._make_list_columns_uniform(rdf)
+            self.assertEqual(res.fillna('').to_dict(orient="records"),
+                             ref.fillna('').to_dict(orient="records"))
+
+            hits = TT.search_by_addr_1("192.168.122.1", res)
+            self.assertEqual(
+                TT.utils.json.loads(TT.utils.dumps_json(hits)), hits
+            )
+
     def test_12_pandas_save_load__excs(self):
         self.assertRaises(ValueError, TT.pandas_save, TT.DF_ZERO,
                           "/a/b/c.ext_not_exist")
@@ -67,6 +177,13 @@ class TestCases_30(C.TestCaseWithWorkdir, TestCasesWithConfigs):
         self.assertTrue(res)
         self.assertFalse(any(rdf.empty for rdf in res))
 
+    def test_22_make_firewall_policy_tables(self):
+        for max_workers in (1, None):
+            res = TT.make_firewall_policy_tables(self.cpaths,
+                                                 max_workers=max_workers)
+            self.assertEqual(len(res), len(self.cpaths))
+            self.assertFalse(any(rdf.empty for rdf in res))
+
     def test_32_make_and_save_firewall_policy_tables(self):
         outdir = os.path.join(self.workdir, "out")
         res = TT.make_and_save_firewall_policy_tables(self.cpaths,
@@ -75,6 +192,25 @@ class TestCases_30(C.TestCaseWithWorkdir, TestCasesWithConfigs):
         self.assertTrue(res)
         self.assertFalse(any(rdf.empty for rdf in res))
 
+    def test_34_make_and_save_firewall_policy_tables__serial(self):
+        outdir = os.path.join(self.workdir, "out")
+        res = TT.make_and_save_firewall_policy_tables(self.cpaths,
+                                                      outname="fw.pickle.gz",
+                                                      outdir=outdir,
+                                                      max_workers=1)
+        self.assertEqual(len(res), len(self.cpaths))
+        self.assertFalse(any(rdf.empty for rdf in res))
+
+    def test_36_make_and_save_firewall_policy_tables__paths_only(self):
+        outdir = os.path.join(self.workdir, "out")
+        for max_workers in (1, 2):
+            res = TT.make_and_save_firewall_policy_tables(
+                self.cpaths, outname="fw.pickle.gz", outdir=outdir,
+                max_workers=max_workers, paths_only=True
+            )
+            self.assertEqual(len(res), len(self.cpaths))
+            self.assertTrue(all(TT.os.path.exists(p) for p in res))
+
 
 class TestCases_40(TestCasesWithConfigs):
 
@@ -97,6 +233,19 @@ class TestCases_40(TestCasesWithConfigs):
             self.assertTrue("G Suite" in rdf["edit"].values)
             self.assertTrue("host_192.168.3.1" in rdf["member"].values)
 
+    def test_22_make_firewall_addrgrp_table__same_as_exploded(self):
+        ags = [dict(edit="g0", uuid="u0", member=["a", "b"]),
+               dict(edit="g1", uuid="u1", member=[]),
+               dict(edit="g2", uuid="u2", member="c"),
+               dict(edit="g3", member=["d"])]
+        cnf = dict(configs=[dict(config="firewall addrgrp", edits=ags)])
+
+        ref = TT.pandas.DataFrame(ags).explode("member")[
+            ["edit", "uuid", "member"]
+        ].reset_index(drop=True)
+        self.assertTrue(TT.make_firewall_addrgrp_table(cnf).equals(ref))
+        self.assertTrue(TT.make_firewall_addrgrp_table(dict(configs=[])).empty)
+
     def test_30_make_firewall_address_table(self):
         for cnf in self.cnfs:
             rdf = TT.make_firewall_address_table(
@@ -111,6 +260,52 @@ class TestCases_40(TestCasesWithConfigs):
             self.assertTrue(any("192.168.3.3/32" in addrs
                                 for addrs in rdf["addrs"].values))
 
+    def test_32_make_firewall_address_table__same_as_merged(self):
+        for cnf in self.cnfs:
+            opts = dict(has_vdoms_=P.has_vdom(cnf))
+            df_fa = TT.make_firewall_address_table_1(cnf, **opts)
+            df_ag = TT.make_firewall_addrgrp_table(cnf, **opts)
+            df_diff = TT.pandas.merge(
+                df_ag, df_fa, left_on="member", right_on="edit",
+                suffixes=('', '_r'), how="left"
+            ).drop(columns=["edit_r", "uuid_r", "member"])
+            ref = TT.pandas.concat([df_fa, df_diff], sort=False)
+
+            rdf = TT.make_firewall_address_table(cnf, **opts)
+            self.assertTrue(rdf.equals(ref))
+            self.assertEqual(list(rdf.index), list(ref.index))
+
+    def test_40_make_addrs_map(self):
+        self.assertEqual(TT.make_addrs_map(TT.DF_ZERO), {})
+
+        for cnf in self.cnfs:
+            df_fa = TT.make_firewall_address_table(
+                cnf,
+                has_vdoms_=P.has_vdom(cnf)
+            )
+            amap = TT.make_addrs_map(df_fa)
+            for edit in ("SSLVPN_TUNNEL_ADDR1", "G Suite", "not_exist"):
+                ref = sorted(
+                    addr for addrs
+                    in df_fa[df_fa["edit"] == edit]["addrs"].dropna()
+                    for addr in addrs
+                )
+                self.assertEqual(amap.get(edit, []), ref, edit)
+                self.assertEqual(
+                    TT.get_firewall_address_by_edit(edit, df_fa), ref
+                )
+
+            edits = ["SSLVPN_TUNNEL_ADDR1", "G Suite"]
+            ref = sorted(amap.get("SSLVPN_TUNNEL_ADDR1", []) +
+                         amap.get("G Suite", []))
+            res = TT.get_firewall_address_by_edits(edits, addrs_map=amap)
+            self.assertEqual(res, ref)
+            self.assertTrue(tuple(edits) in amap)
+
+            res_2 = TT.get_firewall_address_by_edits(edits, addrs_map=amap)
+            self.assertEqual(res_2, ref)
+            self.assertFalse(res_2 is res)
+
 
 class TestCases_50(TestCasesWithConfigs):
 
@@ -121,6 +316,12 @@ class TestCases_50(TestCasesWithConfigs):
         ]
         self.pdfs = [TT.make_firewall_policy_table(c) for c in self.cpaths]
 
+    def test_08_get_addr_ranges(self):
+        for rdf in self.fdfs + self.pdfs:
+            ranges = TT.get_addr_ranges(rdf)
+            self.assertTrue(TT.get_addr_ranges(rdf) is ranges)
+            self.assertTrue(len(ranges[0]))
+
     def test_10_search_by_addr_1__fa_not_found(self):
         for fdf in self.fdfs:
             res = TT.search_by_addr_1("127.0.0.1", fdf)
@@ -145,4 +346,50 @@ class TestCases_50(TestCasesWithConfigs):
             self.assertEqual(len(res), 1)
             self.assertEqual(res[0]["name"], "Monitor_Servers_01")
 
+    def test_30_search_by_addr_1__same_as_linear_search(self):
+        ips = ("127.0.0.1", "192.168.1.1", "192.168.2.1", "192.168.3.3",
+               "192.168.5.201", "192.168.122.3")
+        for rdf in self.fdfs + self.pdfs:
+            recs = rdf.fillna('').to_dict(orient="records")
+            for ip_s in ips:
+                ref = [r for r in recs
+                       if any(TT.netutils.is_ip_in_addrs(ip_s, r.get(k, []))
+                              for k in TT.ADDRS_COL_NAMES)]
+                self.assertEqual(TT.search_by_addr_1(ip_s, rdf), ref)
+
+    def test_40_search_by_addr_indexed(self):
+        ips = ("0.0.0.0", "127.0.0.1", "192.168.1.1", "192.168.2.1",
+               "192.168.3.3", "192.168.5.201", "192.168.122.3",
+               "255.255.255.255")
+        for rdf in self.fdfs + self.pdfs:
+            index = TT.get_addr_index(rdf)
+            self.assertTrue(TT.get_addr_index(rdf) is index)
+
+            for ip_s in ips:
+                self.assertEqual(TT.search_by_addr_indexed(ip_s, rdf),
+                                 TT.search_by_addr_1(ip_s, rdf))
+
+        rdf = TT.pandas.DataFrame(dict(addrs=[["0.0.0.0/0"], ["10.0.0.0/8"],
+                                              ["10.1.0.0/16", "10.1.1.1/32"],
+                                              []]))
+        for ip_s, ref in (("10.1.1.1", [0, 1, 2]), ("10.2.0.1", [0, 1]),
+                          ("11.0.0.1", [0])):
+            res = TT.match_addr_index(int(ipaddress.ip_address(ip_s)),
+                                      TT.make_addr_index(rdf))
+            self.assertEqual(res.tolist(), ref)
+
+        self.assertRaises(ValueError, TT.search_by_addr_indexed, 1, rdf)
+
+    def test_42_search_by_addrs(self):
+        ips = ["127.0.0.1", "192.168.1.1", "192.168.2.1", "192.168.3.3",
+               "192.168.5.201", "192.168.122.3"]
+        for rdf in self.fdfs + self.pdfs:
+            res = TT.search_by_addrs(ips, rdf)
+            self.assertEqual(sorted(res), sorted(ips))
+            for ip_s in ips:
+                self.assertEqual(res[ip_s], TT.search_by_addr_1(ip_s, rdf))
+
+            self.assertEqual(TT.search_by_addrs([], rdf), {})
+            self.assertRaises(ValueError, TT.search_by_addrs, [1], rdf)
+
 # vim:sw=4:ts=4:et:
@@ -5,6 +5,9 @@
 # pylint: disable=missing-docstring,invalid-name
 from __future__ import absolute_import
 
+import subprocess
+import sys
+
 import fortios_xutils as TT
 import tests.api as API
 
@@ -13,4 +16,15 @@ class TestCase(API.TestCase):
 
     mod = TT
 
+    def test_00_import_lazily(self):
+        code = ("import sys, fortios_xutils; "
+                "assert 'pandas' not in sys.modules; "
+                "assert 'networkx' not in sys.modules; "
+                "fortios_xutils.query_json_files; "
+                "assert 'pandas' not in sys.modules")
+        subprocess.check_call([sys.executable, "-c", code])
+
+        self.assertTrue(all(name in dir(TT) for name in TT.__all__))
+        self.assertRaises(AttributeError, getattr, TT, "not_exist")
+
 # vim:sw=4:ts=4:et:
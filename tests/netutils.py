@@ -24,6 +24,25 @@ class TestCase_10_functions(C.unittest.TestCase):
         self.assertEqual(TT.subnet_to_ip("10.0.0.1", "255.0.0.0"),
                          "10.0.0.1/32")
 
+    def test_24_subnets_to_ips(self):
+        subnets = [("10.0.0.0", "255.0.0.0"),
+                   ("10.0.0.1", "255.255.255.255"),
+                   ("10.0.0.1", "255.0.0.0"),
+                   ("192.168.1.128", "255.255.255.128"),
+                   ("0.0.0.0", "0.0.0.0"),
+                   ("10.0.0.0", "0.0.0.255")]  # Looks a host mask.
+
+        res = TT.subnets_to_ips(subnets)
+        self.assertEqual(res[:-1],
+                         [TT.subnet_to_ip(*s) for s in subnets[:-1]])
+        self.assertTrue(res[-1] is None)
+
+        for subnets in ([], [("10.0.0.01", "255.0.0.0")],
+                        [("10.0.0.256", "255.0.0.0")],
+                        [("10.0.0.1", 8)], [("10.0.0.1", "8")]):
+            self.assertEqual(TT.subnets_to_ips(subnets),
+                             [None] * len(subnets))
+
     def test_30_iprange_to_ipsets__ng(self):
         self.assertRaises(ValueError, TT.iprange_to_ipsets, 1, 2)
         self.assertRaises(ValueError, TT.iprange_to_ipsets, "10.0.0.1", 1)
@@ -139,4 +139,40 @@ class TestCases_20(C.TestCaseWithWorkdir, Base):
         for res in fun(cpaths):
             self.assertTrue(res)
 
+    def test_40_compose_network_files(self):
+        cpaths = [os.path.join(self.workdir, hname, "test.json")
+                  for hname in self.hnames]
+
+        for idx, cnf in enumerate(self.cnfs):
+            TT.utils.save_file(cnf, cpaths[idx])
+
+        graphs = TT.collect_and_save_networks_from_config_files(
+            cpaths, max_workers=1
+        )
+        npaths = [os.path.join(os.path.dirname(p), TT.NET_FILENAME)
+                  for p in cpaths]
+
+        graphs_2 = TT.collect_and_save_networks_from_config_files(
+            cpaths, max_workers=None
+        )
+        self.assertEqual([(g["nodes"], g["links"]) for g in graphs_2],
+                         [(g["nodes"], g["links"]) for g in graphs])
+
+        graphs_3 = TT.collect_and_save_networks_from_config_files_itr(
+            iter(cpaths), max_workers=2
+        )
+        self.assertEqual([(g["nodes"], g["links"]) for g in graphs_3],
+                         [(g["nodes"], g["links"]) for g in graphs])
+
+        res = TT.compose_network_files(npaths)
+        self.assertEqual(res["metadata"]["sources"], cpaths)
+
+        nids = set(n["id"] for g in graphs for n in g["nodes"])
+        self.assertEqual(sorted(n["id"] for n in res["nodes"]), sorted(nids))
+        self.assertTrue(all(n["label"] == "{id} {type}".format(**n)
+                            for n in res["nodes"]))
+
+        lids = set(e["id"] for g in graphs for e in g["links"])
+        self.assertEqual(sorted(e["id"] for e in res["links"]), sorted(lids))
+
 # vim:sw=4:ts=4:et:
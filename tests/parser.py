@@ -6,6 +6,8 @@
 from __future__ import absolute_import
 
 import os.path
+import unittest
+import unittest.mock
 
 import fortios_xutils.parser as TT
 import tests.common as C
@@ -25,6 +27,34 @@ class TestCases_10(C.unittest.TestCase):
         self.assertRaises(ValueError, TT.validate, dict(configs=True))
 
 
+class TestCases_12_load(C.unittest.TestCase):
+
+    cpaths = C.list_res_files("parsed", "*/all.json")
+    pexps = ("configs[?config=='system interface'].edits[].ip",
+             "configs[?config=='firewall address'].edits[]",
+             "configs[].config")
+
+    def test_10_load_for_query__wo_ijson(self):
+        with unittest.mock.patch.object(TT, "ijson", None):
+            for cpath in self.cpaths:
+                for pexp in self.pexps:
+                    self.assertEqual(TT.load_for_query(cpath, pexp),
+                                     TT.load(cpath))
+
+    @unittest.skipIf(TT.ijson is None, "ijson is not available")
+    def test_20_load_for_query(self):
+        for cpath in self.cpaths:
+            ref = TT.load(cpath)
+            has_vdoms_ = TT.has_vdom(ref)
+            for pexp in self.pexps:
+                cnf = TT.load_for_query(cpath, pexp)
+                self.assertEqual(TT.has_vdom(cnf), has_vdoms_)
+                self.assertEqual(
+                    TT.jmespath_search(pexp, cnf, has_vdoms_=has_vdoms_),
+                    TT.jmespath_search(pexp, ref, has_vdoms_=has_vdoms_)
+                )
+
+
 class TestCases_20_jmespath_search(C.unittest.TestCase):
 
     maxDiff = None
@@ -115,6 +145,36 @@ class TestCases_20_jmespath_search(C.unittest.TestCase):
         self.assertTrue(res)
         self.assertEqual(res, [val])
 
+    def test_40_extract_configs(self):
+        (fa_0, fa_1, fa_2) = [dict(edit=str(i)) for i in range(3)]
+        cnf = dict(configs=[dict(config="firewall address",
+                                 edits=[fa_0, fa_1]),
+                            dict(config="firewall policy")])
+        self.assertEqual(TT.extract_configs(cnf),
+                         {"firewall address": [fa_0, fa_1]})
+
+        cnf = dict(configs=[dict(config="global",
+                                 configs=[dict(config="firewall address",
+                                               edits=[fa_0])]),
+                            dict(config="vdom",
+                                 edits=[dict(edit="root",
+                                             configs=[dict(config="a",
+                                                           edits=[fa_1])])]),
+                            dict(config="vdom",
+                                 edits=[dict(edit="mng",
+                                             configs=[dict(config="a",
+                                                           edits=[fa_2])])])])
+
+        res = TT.extract_configs(cnf, has_vdoms_=True)
+        self.assertEqual(res, {"firewall address": [fa_0], "a": [fa_1, fa_2]})
+        for cname, edits in res.items():
+            self.assertEqual(TT.config_edits_search(cname, cnf,
+                                                    has_vdoms_=True),
+                             edits)
+
+        res = TT.extract_configs(cnf, has_vdoms_=True, vdom="mng")
+        self.assertEqual(res, {"firewall address": [fa_0], "a": [fa_2]})
+
 
 def _list_cnames_from_file(filepath):
     return sorted(set(line.replace("config ", '').rstrip()
@@ -177,6 +237,30 @@ class TestCases_50(C.TestCaseWithWorkdir):
             for fname in (TT.METADATA_FILENAME, TT.ALL_FILENAME):
                 self.assertTrue(os.path.exists(os.path.join(hdir, fname)))
 
+    def test_12_parse_show_config__cache(self):
+        cache_dir = os.path.join(self.workdir, "cache")
+        for cpath in self.cpaths:
+            ref = TT.parse_show_config(cpath)
+            cnf = TT.parse_show_config(cpath, cache_dir=cache_dir)
+            self.assertEqual(cnf, ref)
+
+            cache = TT.cache_path(cpath, cache_dir)
+            self.assertTrue(os.path.exists(cache))
+
+            cnf = TT.parse_show_config(cpath, cache_dir=cache_dir)
+            self.assertEqual(cnf, ref)
+
+            # Broken cache files are ignored and written again.
+            with open(cache, "r+b") as out:
+                out.truncate(10)
+
+            cnf = TT.parse_show_config(cpath, cache_dir=cache_dir)
+            self.assertEqual(cnf, ref)
+            self.assertEqual(TT.load(cache), ref)
+
+        self.assertFalse([f for f in os.listdir(cache_dir)
+                          if f.endswith(".tmp")])
+
     def test_20_parse_show_configs_and_dump(self):
         for opath, cnf in TT.parse_show_configs_and_dump_itr(self.cpaths,
                                                              self.workdir):
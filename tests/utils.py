@@ -5,8 +5,11 @@
 # pylint: disable=missing-docstring,invalid-name
 from __future__ import absolute_import
 
+import glob
 import os.path
+import pathlib
 import subprocess
+import unittest.mock
 
 import fortios_xutils.utils as TT
 import tests.common as C
@@ -36,6 +39,80 @@ class SimpleFunctionTestCases(C.unittest.TestCase):
         for f in ok_files:
             self.assertTrue(TT.try_ac_load(f) is not None)
 
+    def test_53_try_json_load(self):
+        for fpath in C.list_res_files("try_ac_load", "*utf-8_ok.json"):
+            ref = TT.try_ac_load(fpath)
+            self.assertEqual(TT.try_json_load(fpath), ref)
+
+        for fpath in C.list_res_files("try_ac_load", "*shift-jis_ok.json"):
+            self.assertTrue(TT.try_json_load(fpath) is None)
+
+    def test_55_load_file(self):
+        for fpath in C.list_res_files("networks", "*.yml"):
+            ref = TT.try_ac_load(fpath)
+            self.assertEqual(TT.try_yaml_load(fpath), ref)
+            self.assertEqual(TT.load_file(fpath), ref)
+            self.assertEqual(TT.load_file(pathlib.Path(fpath)), ref)
+
+        for fpath in C.list_res_files("try_ac_load", "*_ok.json"):
+            self.assertEqual(TT.load_file(fpath), TT.try_ac_load(fpath))
+
+    def test_54_compile_jmespath(self):
+        exp = "a[].b"
+        self.assertTrue(TT.compile_jmespath(exp) is TT.compile_jmespath(exp))
+        self.assertEqual(TT.search(exp, dict(a=[dict(b=1), dict(b=2)])),
+                         [1, 2])
+
+    def test_56_dumps_json(self):
+        data = dict(a=[1, dict(b="\u3042")], c=None)
+        for indent in (False, True):
+            res = TT.dumps_json(data, indent=indent)
+            with unittest.mock.patch.object(TT, "orjson", None):
+                self.assertEqual(TT.dumps_json(data, indent=indent), res)
+
+            self.assertEqual(TT.json.loads(res), data)
+
+    def test_57_tmap_itr(self):
+        items = list(range(-10, 10))
+        ref = [abs(i) for i in items]
+        for max_workers in (1, 4, None):
+            self.assertEqual(list(TT.tmap_itr(abs, items, max_workers)), ref)
+
+        itr = TT.tmap_itr(abs, items, 2)
+        self.assertEqual(next(itr), ref[0])
+        itr.close()
+
+        # Items are consumed lazily and only a few of them are run ahead.
+        consumed = []
+        itr = TT.tmap_itr(abs, (consumed.append(i) or i for i in items), 2)
+        self.assertEqual(next(itr), ref[0])
+        self.assertEqual(len(consumed), 4)
+        self.assertEqual(list(itr), ref[1:])
+
+    def test_58_pmap_itr(self):
+        items = list(range(-10, 10))
+        ref = [abs(i) for i in items]
+        for max_workers in (1, 2, None):
+            res = TT.pmap_itr(abs, iter(items), max_workers)
+            self.assertEqual(list(res), ref)
+
+        self.assertEqual(list(TT.pmap_itr(abs, [-1], 2)), [1])
+        self.assertEqual(list(TT.pmap_itr(abs, [], 2)), [])
+
+    def test_59_get_max_workers(self):
+        env = {TT.JOBS_ENVVAR: "3"}
+        with unittest.mock.patch.dict(TT.os.environ, env):
+            self.assertEqual(TT.get_max_workers(), 3)
+            self.assertEqual(TT.get_max_workers(1), 1)
+
+        with unittest.mock.patch.dict(TT.os.environ, {TT.JOBS_ENVVAR: ""}):
+            self.assertTrue(TT.get_max_workers() is None)
+
+        for jobs in ("0", "x"):
+            env = {TT.JOBS_ENVVAR: jobs}
+            with unittest.mock.patch.dict(TT.os.environ, env):
+                self.assertRaises(ValueError, TT.get_max_workers)
+
     def test_60_expand_glob_paths_itr(self):
         ref = sorted(
             os.path.join(
@@ -48,4 +125,101 @@ class SimpleFunctionTestCases(C.unittest.TestCase):
         )
         self.assertEqual(res, ref)
 
+        res = TT.expand_glob_paths_itr(["tests/res/show_configs/*.txt"],
+                                       sort=False)
+        self.assertEqual(sorted(res), ref)
+
+        res = list(
+            TT.expand_glob_paths_itr(["tests/res/**/*_sample_*.txt"])
+        )
+        self.assertEqual(res, ref)
+
+        res = list(TT.expand_glob_paths_itr([pathlib.Path(ref[0])]))
+        self.assertEqual(res, ref[:1])
+
+
+class TestCasesWithWorkdir(C.TestCaseWithWorkdir):
+
+    data = dict(a=1, b=[dict(c="d")], e="\u3042")
+
+    def test_10_save_json_and_try_json_load(self):
+        fpath = os.path.join(self.workdir, "a", "b.json")
+        TT.save_json(self.data, fpath)
+        self.assertEqual(TT.try_json_load(fpath), self.data)
+
+        TT.save_json(dict(a=2), fpath, atomic=True)
+        self.assertEqual(TT.try_json_load(fpath), dict(a=2))
+        self.assertEqual(os.listdir(os.path.dirname(fpath)), ["b.json"])
+
+    def test_12_save_json_and_try_json_load__wo_orjson(self):
+        fpath = os.path.join(self.workdir, "b.json")
+        with unittest.mock.patch.object(TT, "orjson", None):
+            TT.save_json(self.data, fpath)
+            self.assertEqual(TT.try_json_load(fpath), self.data)
+
+    def test_13_try_json_load__invalid_files(self):
+        for name, content in (("empty.json", b''), ("ng.json", b"{a: 1")):
+            fpath = os.path.join(self.workdir, name)
+            with open(fpath, "wb") as out:
+                out.write(content)
+
+            self.assertTrue(TT.try_json_load(fpath) is None)
+            with unittest.mock.patch.object(TT, "orjson", None):
+                self.assertTrue(TT.try_json_load(fpath) is None)
+
+    def test_14_save_file(self):
+        for ext in ("json", "yml"):
+            fpath = os.path.join(self.workdir, "c." + ext)
+            TT.save_file(self.data, fpath)
+            self.assertEqual(TT.try_ac_load(fpath), self.data)
+
+    def test_20_file_cache(self):
+        fpath = os.path.join(self.workdir, "a.json")
+        TT.save_json(self.data, fpath)
+
+        load = TT.file_cache(maxsize=1)(TT.try_json_load)
+        res = load(fpath)
+        self.assertEqual(res, self.data)
+        self.assertTrue(load(fpath) is res)
+
+        TT.save_json(dict(a=2, b=3), fpath)
+        self.assertEqual(load(fpath), dict(a=2, b=3))
+
+        res = load(fpath)
+        load.cache_clear()
+        self.assertFalse(load(fpath) is res)
+
+    def test_30_iglob_in_parallel(self):
+        for rpath in ("a.json", "b/a.json", "b/c/a.json", "d/e/f.json",
+                      "d/g.txt", ".h/a.json", "i/.j/a.json"):
+            fpath = os.path.join(self.workdir, rpath)
+            TT.save_json(self.data, fpath)
+
+        for rest in ("*.json", "a.json", "**/*.json", "e/*"):
+            pat = os.path.join(self.workdir, "**", rest)
+            ref = sorted(glob.glob(pat, recursive=True))
+            self.assertEqual(sorted(TT.iglob_in_parallel(pat)), ref, rest)
+            self.assertEqual(
+                list(TT.expand_glob_paths_itr([pat])), ref, rest
+            )
+
+    def test_40_resolve_filepaths(self):
+        paths = [os.path.join(self.workdir, "a.json")]
+        self.assertEqual(TT.resolve_filepaths(paths), tuple(paths))
+
+        for rpath in ("a/b.json", "c/b.json"):
+            TT.save_json(self.data, os.path.join(self.workdir, rpath))
+
+        os.makedirs(os.path.join(self.workdir, "d"))
+
+        pat = os.path.join(self.workdir, "*", "b.json")
+        ref = tuple(sorted(glob.glob(pat)))
+        self.assertEqual(TT.resolve_filepaths([pat]), ref)
+
+        # New files in the dirs had no matches must be found.
+        TT.save_json(self.data, os.path.join(self.workdir, "d/b.json"))
+        res = TT.resolve_filepaths([pat])
+        self.assertEqual(len(res), len(ref) + 1)
+        self.assertEqual(list(TT.expand_glob_paths_itr([pat])), list(res))
+
 # vim:sw=4:ts=4:et: